@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import time
+
+import aiohttp
+from lxml import etree
+
+from anime_news_network.results import Results
+from anime_news_network.search import URL, DELAY, LABEL_IDS, is_id, _search_cache, _load_titles, \
+    _query_search, _results, _save_results, _unique_ids, _ids_chunks, _save_misses, _is_negative
+from anime_news_network.cache import title_miss_age
+from anime_news_network.freshness import REFRESH_BATCH
+
+CONNECTIONS_LIMIT = 4
+KEEPALIVE_TIMEOUT = 30
+REQUEST_TIMEOUT = 30
+
+logger = logging.getLogger('anime_news_network.aio')
+
+
+class AsyncRateLimiter(object):
+    """Token bucket shared by all the coroutines that use it. It refills rate tokens per
+    second up to burst tokens. The waiting coroutines are served in arrival order. It can
+    be used from successive event loops (one asyncio.run() after another).
+    """
+
+    def __init__(self, rate=1.0 / DELAY, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self._lock = None
+        self._loop = None
+
+    @property
+    def lock(self):
+        # El lock es del bucle que lo usa por primera vez: con otro bucle se crea uno nuevo
+        loop = asyncio.get_event_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        async with self.lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class AsyncRefresher(object):
+    """Refresher of the stale cache entries served by an AsyncSearch (see
+    anime_news_network.freshness.Refresher). The requests are made in tasks of the event
+    loop, through the client and its rate limiter.
+    """
+
+    def __init__(self, search):
+        self.search = search
+        self.pending = set()
+        self.ids = []
+        self.tasks = set()
+
+    def add(self, key):
+        if key in self.pending:
+            return
+        self.pending.add(key)
+        if isinstance(key, tuple):
+            self._start(self._refresh_search(key))
+            return
+        self.ids.append(key)
+        if len(self.ids) == 1:
+            # Los ids añadidos en la misma iteración del bucle se piden juntos
+            asyncio.get_event_loop().call_soon(self._flush)
+
+    def _start(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def _flush(self):
+        ids, self.ids = self.ids, []
+        for i in range(0, len(ids), REFRESH_BATCH):
+            self._start(self._refresh_ids(ids[i:i + REFRESH_BATCH]))
+
+    async def _refresh_ids(self, ids):
+        try:
+            await self.search.search_many(ids, cache=False)
+        except Exception:
+            logger.exception('Error refreshing the titles %s', ids)
+        finally:
+            self.pending.difference_update(ids)
+
+    async def _refresh_search(self, key):
+        query, label = key
+        try:
+            await self.search._search_request(query, label)
+        except Exception:
+            logger.exception('Error refreshing the search %s (%s)', query, label)
+        finally:
+            self.pending.discard(key)
+
+    async def wait(self):
+        """Wait until all the queued entries have been refreshed"""
+        while self.ids or self.tasks:
+            if self.ids:
+                self._flush()
+            await asyncio.gather(*list(self.tasks))
+
+
+class AsyncSearch(object):
+    """Asyncio client. It uses the same caches as anime_news_network.search, but the requests
+    are made with aiohttp through a keep-alive connection pool. Concurrent searches with
+    the same query share the same request. The session, the requests in progress and the
+    refresher belong to an event loop; they are created again when used from another one.
+    """
+
+    def __init__(self, url=URL, rate_limiter=None, limit=CONNECTIONS_LIMIT, timeout=REQUEST_TIMEOUT):
+        self.url = url
+        self.rate_limiter = rate_limiter or AsyncRateLimiter()
+        self.limit = limit
+        self.timeout = timeout
+        self._session = None
+        self._loop = None
+        # (label, query): tarea de la petición en curso
+        self._flights = {}
+        self.refresher = AsyncRefresher(self)
+
+    def _check_loop(self):
+        loop = asyncio.get_event_loop()
+        if self._loop is loop:
+            return
+        if self._loop is not None:
+            # Las conexiones, tareas y futures del bucle anterior no sirven en éste
+            self._session = None
+            self._flights = {}
+            self.refresher = AsyncRefresher(self)
+        self._loop = loop
+
+    @property
+    def session(self):
+        self._check_loop()
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, keepalive_timeout=KEEPALIVE_TIMEOUT)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def request(self, query_search):
+        async with self.rate_limiter:
+            async with self.session.get(self.url, params=query_search) as response:
+                response.raise_for_status()
+                data = await response.read()
+        return _results(etree.fromstring(data))
+
+    async def search(self, query, label='title'):
+        self._check_loop()
+        if is_id(query):
+            label = LABEL_IDS
+        results = _search_cache(query, label, self.refresher)
+        if results is None:
+            key = (label, query)
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = asyncio.ensure_future(self._search_request(query, label))
+                flight.add_done_callback(lambda _: self._flights.pop(key, None))
+            # La cancelación de una de las búsquedas no cancela la petición compartida
+            results = await asyncio.shield(flight)
+        return results
+
+    async def _search_request(self, query, label):
+        results = _save_results(await self.request(_query_search(query, label)), query, label)
+        if is_id(query):
+            _save_misses([query], results)
+        return results
+
+    async def search_many(self, ids, cache=True):
+        self._check_loop()
+        ids = _unique_ids(ids)
+        items = _load_titles(ids) if cache else {}
+        if cache:
+            ids = [id for id in ids if id in items or not _is_negative(title_miss_age(id))]
+        chunks = list(_ids_chunks([id for id in ids if id not in items]))
+        responses = await asyncio.gather(*[self.request(query_search) for query_search in chunks])
+        for query_search, results in zip(chunks, responses):
+            _save_misses(map(int, query_search[LABEL_IDS].split('/')), results)
+            items.update((item.id, item) for item in _save_results(results))
+        return Results([items[id] for id in ids if id in items])
+
+    async def close(self):
+        if self._session is not None and self._loop is asyncio.get_event_loop():
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+default_search = None
+
+
+def get_default_search():
+    global default_search
+    if default_search is None:
+        default_search = AsyncSearch()
+    return default_search
+
+
+def set_default_search(search):
+    global default_search
+    default_search = search
+
+
+async def search(query, label='title'):
+    return await get_default_search().search(query, label)
+
+
+async def search_many(ids, cache=True):
+    return await get_default_search().search_many(ids, cache)
@@ -0,0 +1,207 @@
+from collections import OrderedDict
+
+from anime_news_network.cache import title_cache_ids, load_title_cache
+from anime_news_network.results import Results
+from lxml import etree
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Títulos que se leen de la caché en cada Results
+CHUNK_SIZE = 500
+# Clases de los títulos (columna kind)
+KINDS = ['Anime', 'Manga']
+SCORES = ['bayesian_score', 'weighted_score']
+BITSET_WORD = 64
+
+
+def _vocabulary_index(vocabulary, value):
+    index = vocabulary.get(value)
+    if index is None:
+        index = vocabulary[value] = len(vocabulary)
+    return index
+
+
+def _bitsets(rows, size):
+    """uint64 matrix with a row per title and a bit per vocabulary entry"""
+    bitsets = numpy.zeros((len(rows), max(1, (size + BITSET_WORD - 1) // BITSET_WORD)), dtype=numpy.uint64)
+    for i, indexes in enumerate(rows):
+        for index in indexes:
+            bitsets[i, index // BITSET_WORD] |= numpy.uint64(1 << (index % BITSET_WORD))
+    return bitsets
+
+
+class Catalog(object):
+    """Columnar view of a set of titles in NumPy arrays, for filters, sorts and top-k
+    queries over the whole catalog. Columns:
+
+    - id, kind (index in KINDS), type (index in types), name.
+    - bayesian_score, weighted_score (nan without rating) and nb_votes.
+    - number_of_episodes (0 if unknown) and release_date (datetime64[D], NaT if unknown).
+    - genres and themes: bitsets of the genre_names and theme_names vocabularies.
+
+    The filter methods return boolean masks that can be combined with & and |::
+
+        catalog = Catalog.from_cache()
+        catalog.top(100, 'bayesian_score', catalog.has_genre('action') & catalog.released_after('2010-12-31'))
+    """
+
+    def __init__(self, columns, types, genre_names, theme_names):
+        if numpy is None:
+            raise ImportError('The numpy package is required for the catalog analytics')
+        self.columns = columns
+        self.types = types
+        self.genre_names = genre_names
+        self.theme_names = theme_names
+
+    @classmethod
+    def from_titles(cls, titles):
+        """Build the catalog from Manganime items or Records"""
+        if numpy is None:
+            raise ImportError('The numpy package is required for the catalog analytics')
+        rows = OrderedDict((key, []) for key in ['id', 'kind', 'type', 'name', 'bayesian_score',
+                                                 'weighted_score', 'nb_votes', 'number_of_episodes',
+                                                 'release_date', 'genres', 'themes'])
+        types, genres, themes = OrderedDict(), OrderedDict(), OrderedDict()
+        for title in titles:
+            rating = title.get('rating') or {}
+            rows['id'].append(title['id'])
+            rows['kind'].append(KINDS.index(title['class']) if title.get('class') in KINDS else -1)
+            rows['type'].append(_vocabulary_index(types, title.get('type') or ''))
+            rows['name'].append(title.get('name') or '')
+            for score in SCORES:
+                rows[score].append(rating.get(score, numpy.nan))
+            rows['nb_votes'].append(rating.get('nb_votes', 0))
+            rows['number_of_episodes'].append(title.get('number_of_episodes') or 0)
+            rows['release_date'].append(title.get('release_date') or 'NaT')
+            rows['genres'].append([_vocabulary_index(genres, x['name']) for x in title.get('genres', [])])
+            rows['themes'].append([_vocabulary_index(themes, x['name']) for x in title.get('themes', [])])
+        columns = {
+            'id': numpy.array(rows['id'], dtype=numpy.int64),
+            'kind': numpy.array(rows['kind'], dtype=numpy.int8),
+            'type': numpy.array(rows['type'], dtype=numpy.int32),
+            'name': numpy.array(rows['name'], dtype=object),
+            'nb_votes': numpy.array(rows['nb_votes'], dtype=numpy.int64),
+            'number_of_episodes': numpy.array(rows['number_of_episodes'], dtype=numpy.int32),
+            'release_date': numpy.array(rows['release_date'], dtype='datetime64[D]'),
+            'genres': _bitsets(rows['genres'], len(genres)),
+            'themes': _bitsets(rows['themes'], len(themes)),
+        }
+        for score in SCORES:
+            columns[score] = numpy.array(rows[score], dtype=numpy.float64)
+        return cls(columns, list(types), list(genres), list(themes))
+
+    @classmethod
+    def from_cache(cls, ids=None, workers=None):
+        """Build the catalog from the cached titles (all of them by default). The titles are
+        parsed in lazy mode, so only the sections of the columns are built. With workers,
+        they are parsed in a pool of processes (see anime_news_network.parallel).
+        """
+        ids = list(title_cache_ids('xml') if ids is None else ids)
+        if workers:
+            from anime_news_network.parallel import parse_cache_parallel
+            return cls.from_titles(parse_cache_parallel(ids, workers))
+        return cls.from_titles(cls._iter_cache(ids))
+
+    @staticmethod
+    def _iter_cache(ids):
+        for i in range(0, len(ids), CHUNK_SIZE):
+            ann = etree.Element('ann')
+            for id in ids[i:i + CHUNK_SIZE]:
+                element = load_title_cache(id, ext='xml')
+                if element is not None:
+                    ann.append(element)
+            for title in Results(ann, lazy=True):
+                yield title
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def _bit(self, column, names, name):
+        if name not in names:
+            return numpy.zeros(len(self), dtype=bool)
+        index = names.index(name)
+        word = self.columns[column][:, index // BITSET_WORD]
+        return (word >> numpy.uint64(index % BITSET_WORD)) & numpy.uint64(1) == 1
+
+    def has_genre(self, name):
+        return self._bit('genres', self.genre_names, name)
+
+    def has_theme(self, name):
+        return self._bit('themes', self.theme_names, name)
+
+    def is_kind(self, kind):
+        return self.columns['kind'] == KINDS.index(kind)
+
+    def is_type(self, type):
+        return self.columns['type'] == (self.types.index(type) if type in self.types else -1)
+
+    def released_after(self, date):
+        """Titles released after the date (a date or a 'YYYY-MM-DD' string)"""
+        return self.columns['release_date'] > numpy.datetime64(date, 'D')
+
+    def released_before(self, date):
+        return self.columns['release_date'] < numpy.datetime64(date, 'D')
+
+    def filter(self, mask):
+        """New catalog with the titles of a boolean mask (or an array of positions)"""
+        return Catalog({key: value[mask] for key, value in self.columns.items()},
+                       self.types, self.genre_names, self.theme_names)
+
+    def _sort_key(self, column, reverse):
+        values = self.columns[column]
+        if values.dtype.kind == 'f':
+            # Los títulos sin valor (nan) quedan siempre al final
+            return numpy.where(numpy.isnan(values), numpy.inf, -values if reverse else values)
+        elif values.dtype.kind == 'M':
+            values = values.astype(numpy.int64)
+            missing = values == numpy.iinfo(numpy.int64).min
+            return numpy.where(missing, numpy.iinfo(numpy.int64).max, -values if reverse else values)
+        return -values if reverse else values
+
+    def sort(self, column, reverse=False):
+        return self.filter(numpy.argsort(self._sort_key(column, reverse), kind='stable'))
+
+    def top(self, k, column, mask=None, reverse=True):
+        """The k titles with the highest value of a column (the lowest with reverse=False),
+        optionally only among the titles of a mask. The result is sorted.
+        """
+        catalog = self if mask is None else self.filter(mask)
+        key = catalog._sort_key(column, reverse)
+        if k < len(catalog):
+            positions = numpy.argpartition(key, k)[:k]
+            positions = positions[numpy.argsort(key[positions], kind='stable')]
+        else:
+            positions = numpy.argsort(key, kind='stable')
+        return catalog.filter(positions)
+
+    def genres(self, position):
+        return self._names(self.columns['genres'][position], self.genre_names)
+
+    def themes(self, position):
+        return self._names(self.columns['themes'][position], self.theme_names)
+
+    @staticmethod
+    def _names(bitset, names):
+        return [name for i, name in enumerate(names)
+                if int(bitset[i // BITSET_WORD]) >> (i % BITSET_WORD) & 1]
+
+    def save(self, path):
+        """Save the catalog in a NumPy .npz file"""
+        columns = dict(self.columns, name=self.columns['name'].astype(str))
+        numpy.savez(path, types=numpy.array(self.types, dtype=str), genre_names=numpy.array(self.genre_names, dtype=str),
+                    theme_names=numpy.array(self.theme_names, dtype=str), **columns)
+
+    @classmethod
+    def load(cls, path):
+        if numpy is None:
+            raise ImportError('The numpy package is required for the catalog analytics')
+        with numpy.load(path) as data:
+            columns = {key: data[key] for key in data.files if key not in ('types', 'genre_names', 'theme_names')}
+            columns['name'] = columns['name'].astype(object)
+            return cls(columns, data['types'].tolist(), data['genre_names'].tolist(), data['theme_names'].tolist())
@@ -0,0 +1,260 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+replace = getattr(os, 'replace', os.rename)
+
+
+def makedirs(path, mode=0o777, exist_ok=False):
+    if exist_ok and (not path or os.path.isdir(path)):
+        return
+    try:
+        os.makedirs(path, mode)
+    except OSError:
+        # Creado por otro proceso
+        if not (exist_ok and os.path.isdir(path)):
+            raise
+
+
+_umask = None
+
+
+def get_umask():
+    global _umask
+    if _umask is None:
+        _umask = _read_umask()
+    return _umask
+
+
+def _read_umask():
+    # En Linux se lee de /proc. Si no, sólo se puede leer cambiándola (afecta un instante
+    # a los demás hilos), una vez, la primera vez que se escribe
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('Umask:'):
+                    return int(line.split()[1], 8)
+    except (IOError, OSError, ValueError):
+        pass
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+def atomic_write(path, data):
+    """Write bytes to a temporary file in the same directory and rename it to path, so the
+    readers (in other processes too) see the old file or the new one, never a partial one.
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # mkstemp crea el archivo con 0600: se usan los permisos de open() (0666 y la umask)
+        os.chmod(tmp, 0o666 & ~get_umask())
+        replace(tmp, path)
+    except Exception:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class CacheBackend(object):
+    """Base class for the key-value stores shared by the caches. The keys are paths like
+    'titles/1.xml' and the values are bytes.
+    """
+
+    def get(self, key):
+        """Value of the key. None if it does not exist"""
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def age(self, key):
+        """Seconds since the key was set or touched. None if it does not exist"""
+        raise NotImplementedError
+
+    def touch(self, key):
+        raise NotImplementedError
+
+    def keys(self, prefix):
+        """Keys that start with a prefix ('titles/'...)"""
+        raise NotImplementedError
+
+
+class FileBackend(CacheBackend):
+    """A file per key under the root directory. The writes are atomic."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def get_path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def get(self, key):
+        path = self.get_path(key)
+        if not os.path.lexists(path):
+            return
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def set(self, key, value):
+        path = self.get_path(key)
+        makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, value)
+
+    def delete(self, key):
+        path = self.get_path(key)
+        if os.path.lexists(path):
+            os.remove(path)
+
+    def age(self, key):
+        path = self.get_path(key)
+        if os.path.lexists(path):
+            return time.time() - os.path.getmtime(path)
+
+    def touch(self, key):
+        path = self.get_path(key)
+        if os.path.lexists(path):
+            os.utime(path, None)
+
+    def keys(self, prefix):
+        directory, start = prefix.rsplit('/', 1) if '/' in prefix else ('', prefix)
+        path = self.get_path(directory) if directory else self.root
+        if not os.path.isdir(path):
+            return
+        for file in os.listdir(path):
+            if file.startswith(start) and not file.startswith('.tmp-'):
+                yield '/'.join([directory, file]) if directory else file
+
+
+class SqliteDatabase(object):
+    """SQLite database shared by the threads of the process. The connection is opened on
+    first use. If the user_version of the database is lower than version, the subclass
+    creates or migrates its tables in create_tables(connection), in a transaction.
+    """
+    version = 1
+    # Modo WAL: varios procesos pueden leer mientras otro escribe
+    wal = False
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._setup()
+        return self._connection
+
+    def _setup(self):
+        connection = self._connection
+        if self.wal:
+            connection.execute('PRAGMA journal_mode=WAL')
+        if connection.execute('PRAGMA user_version').fetchone()[0] >= self.version:
+            return
+        with connection:
+            self.create_tables(connection)
+            connection.execute('PRAGMA user_version = {}'.format(self.version))
+
+    def create_tables(self, connection):
+        raise NotImplementedError
+
+    def close(self):
+        with self.lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class SqliteBackend(SqliteDatabase, CacheBackend):
+    """Embedded database backend. The database is in WAL mode, so several processes of the
+    same host can read while another one writes.
+    """
+    wal = True
+
+    def create_tables(self, connection):
+        connection.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                           'updated_at REAL NOT NULL) WITHOUT ROWID')
+
+    def _execute(self, sql, parameters=()):
+        with self.lock:
+            connection = self.connection
+            with connection:
+                return connection.execute(sql, parameters).fetchall()
+
+    def get(self, key):
+        rows = self._execute('SELECT value FROM entries WHERE key = ?', (key,))
+        if rows:
+            return bytes(rows[0][0])
+
+    def set(self, key, value):
+        self._execute('INSERT OR REPLACE INTO entries (key, value, updated_at) VALUES (?, ?, ?)',
+                      (key, sqlite3.Binary(value), time.time()))
+
+    def delete(self, key):
+        self._execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def age(self, key):
+        rows = self._execute('SELECT updated_at FROM entries WHERE key = ?', (key,))
+        if rows:
+            return time.time() - rows[0][0]
+
+    def touch(self, key):
+        self._execute('UPDATE entries SET updated_at = ? WHERE key = ?', (time.time(), key))
+
+    def keys(self, prefix):
+        # Rango de claves con el prefijo (usa la clave primaria, a diferencia de LIKE)
+        rows = self._execute('SELECT key FROM entries WHERE key >= ? AND key < ?', (prefix, prefix + u'￿'))
+        return [row[0] for row in rows]
+
+
+class RedisBackend(CacheBackend):
+    """Backend on a Redis server (or any server of the Redis protocol), shared by all the
+    processes and hosts. Each key is a hash with the value and its time. client is a
+    redis.StrictRedis-like object; by default it is created from url.
+    """
+
+    def __init__(self, client=None, url='redis://localhost:6379/0', prefix='anime_news_network:'):
+        if client is None:
+            # Importación diferida: redis es opcional y lento de importar
+            try:
+                import redis
+            except ImportError:
+                raise ImportError('The redis package is required for the Redis cache backend')
+            client = redis.StrictRedis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.hget(self.prefix + key, 'value')
+
+    def set(self, key, value):
+        self.client.hset(self.prefix + key, mapping={'value': value, 'time': repr(time.time())})
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def age(self, key):
+        value = self.client.hget(self.prefix + key, 'time')
+        if value is not None:
+            return time.time() - float(value)
+
+    def touch(self, key):
+        if self.client.exists(self.prefix + key):
+            self.client.hset(self.prefix + key, 'time', repr(time.time()))
+
+    def keys(self, prefix):
+        for key in self.client.scan_iter(match='{}{}*'.format(self.prefix, prefix)):
+            if isinstance(key, bytes):
+                key = key.decode('utf-8')
+            yield key[len(self.prefix):]
@@ -1,27 +1,27 @@
+import copy
 import csv
 import datetime
 import hashlib
 import os
+import time
 
 import json
 import six
 from lxml import etree
 
-CACHE_DIR = os.path.expanduser('~/.local/cache')
+from anime_news_network import memory, metrics
+from anime_news_network.backends import atomic_write, makedirs, FileBackend, SqliteDatabase
+
+# Directorio raíz de la caché local. Se puede cambiar con la variable de entorno ANN_CACHE_DIR
+CACHE_DIR = os.environ.get('ANN_CACHE_DIR') or os.path.expanduser('~/.local/cache')
 WORDS_CACHE_DIR = os.path.join(CACHE_DIR, 'words')
 TITLES_CACHE_DIR = os.path.join(CACHE_DIR, 'titles')
+WORDS_DB = os.path.join(CACHE_DIR, 'words.sqlite3')
+INDEX_DB = os.path.join(CACHE_DIR, 'index.sqlite3')
 WORDS_CSV_FIELDS = ['name', 'label', 'titles', 'updated_at']
 WORDS_CSV_DIALECT = 'excel-tab'
-
-def makedirs(path, mode=0o777, exist_ok=False):
-    if exist_ok and os.path.exists(path):
-        return
-    os.makedirs(path, mode)
-
-
-makedirs(CACHE_DIR, exist_ok=True)
-makedirs(WORDS_CACHE_DIR, exist_ok=True)
-makedirs(TITLES_CACHE_DIR, exist_ok=True)
+# Funciones (name, data) a las que se llama al guardar un título xml
+title_cache_listeners = []
 
 
 def get_title_cache_path(name, ext='json'):
@@ -29,67 +29,380 @@ def get_title_cache_path(name, ext='json'):
     return os.path.join(TITLES_CACHE_DIR, '.'.join([name, ext]))
 
 
-def get_word_cache_path(name):
+def get_word_cache_path(name, directory=WORDS_CACHE_DIR):
     hash = hashlib.md5(name.encode('utf-8')).hexdigest()[:2]
-    return os.path.join(WORDS_CACHE_DIR, '{}.csv'.format(hash))
+    return os.path.join(directory, '{}.csv'.format(hash))
+
+
+class TitleStore(object):
+    """Base class for the stores of the xml titles. The titles are saved as bytes."""
+
+    def load(self, name):
+        raise NotImplementedError
+
+    def save(self, name, data):
+        raise NotImplementedError
+
+    def age(self, name):
+        """Seconds since the title was saved or touched. None if it is not in the store"""
+        raise NotImplementedError
+
+    def touch(self, name):
+        raise NotImplementedError
+
+    def ids(self):
+        raise NotImplementedError
+
+
+class DirectoryTitleStore(TitleStore):
+    """A file <name>.xml per title in the directory."""
+
+    def __init__(self, directory=TITLES_CACHE_DIR, ext='xml'):
+        self.directory = directory
+        self.ext = ext
+
+    def get_path(self, name):
+        return os.path.join(self.directory, '.'.join([str(name), self.ext]))
+
+    def load(self, name):
+        file = self.get_path(name)
+        if not os.path.lexists(file):
+            return
+        with open(file, 'rb') as f:
+            return f.read()
+
+    def save(self, name, data):
+        makedirs(self.directory, exist_ok=True)
+        atomic_write(self.get_path(name), data)
+
+    def age(self, name):
+        file = self.get_path(name)
+        if os.path.lexists(file):
+            return time.time() - os.path.getmtime(file)
+
+    def touch(self, name):
+        file = self.get_path(name)
+        if os.path.lexists(file):
+            os.utime(file, None)
+
+    def ids(self):
+        suffix = '.{}'.format(self.ext)
+        if not os.path.isdir(self.directory):
+            return
+        for file in os.listdir(self.directory):
+            name = file[:-len(suffix)]
+            if file.endswith(suffix) and name.isdigit():
+                yield int(name)
+
+
+class BackendTitleStore(TitleStore):
+    """Titles store on a CacheBackend, with the keys titles/<name>.xml"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def load(self, name):
+        return self.backend.get(_title_key(name, 'xml'))
+
+    def save(self, name, data):
+        self.backend.set(_title_key(name, 'xml'), data)
+
+    def age(self, name):
+        return self.backend.age(_title_key(name, 'xml'))
+
+    def touch(self, name):
+        self.backend.touch(_title_key(name, 'xml'))
+
+    def ids(self):
+        return _backend_ids(self.backend, 'xml')
+
+
+def _title_key(name, ext):
+    return 'titles/{}.{}'.format(name, ext)
+
+
+def _backend_ids(backend, ext):
+    suffix = '.{}'.format(ext)
+    for key in backend.keys('titles/'):
+        name = key[len('titles/'):-len(suffix)]
+        if key.endswith(suffix) and name.isdigit():
+            yield int(name)
+
+
+title_store = None
+cache_backend = None
+
+
+def get_cache_backend():
+    """Backend of the json title files (validators, missing titles...). By default, the files
+    in CACHE_DIR.
+    """
+    global cache_backend
+    if cache_backend is None:
+        cache_backend = FileBackend(CACHE_DIR)
+    return cache_backend
+
+
+def set_cache_backend(backend):
+    """Use a CacheBackend for all the caches: titles, words searches and json files. For
+    example, a RedisBackend shared by the workers of several hosts.
+    """
+    global cache_backend
+    cache_backend = backend
+    set_title_store(BackendTitleStore(backend))
+    set_word_cache(BackendWordCache(backend))
+
+
+def get_title_store():
+    global title_store
+    if title_store is None:
+        title_store = DirectoryTitleStore()
+    return title_store
+
+
+def set_title_store(store):
+    global title_store
+    title_store = store
+    memory.titles.clear()
+    memory.manganimes.clear()
+    memory.related.clear()
 
 
 def save_title_cache(data, name, ext='json'):
-    file = get_title_cache_path(name, ext)
+    element = data
+    if ext == 'xml':
+        if not isinstance(data, (six.string_types, six.binary_type)):
+            data = etree.tostring(data)
+        if isinstance(data, six.text_type):
+            data = data.encode('utf-8')
+        get_title_store().save(str(name), data)
+        memory.invalidate_title(name)
+        if os.path.lexists(INDEX_DB):
+            # El índice local ya se usa en esta caché: se mantiene al día aunque este proceso
+            # (ann-sync...) no lo haya consultado
+            from anime_news_network.index import get_title_index
+            get_title_index()
+        for listener in title_cache_listeners:
+            listener(name, element)
+        return
     if not isinstance(data, six.string_types) and ext == 'json':
         data = json.dumps(data)
-    elif not isinstance(data, six.string_types) and ext == 'xml':
-        data = etree.tostring(data)
-        data = data.decode('utf-8')
-    with open(file, 'w') as f:
-        f.write(data)
+    get_cache_backend().set(_title_key(name, ext), data.encode('utf-8'))
 
 
 def load_title_cache(name, ext='json'):
     name = str(name)
-    file = get_title_cache_path(name, ext)
-    if not os.path.lexists(file):
+    if ext == 'xml':
+        element = memory.titles.get(name)
+        if element is None:
+            data = get_title_store().load(name)
+            if metrics.registry.enabled:
+                metrics.registry.increment('cache_misses_total' if data is None else 'cache_hits_total',
+                                           layer='title_store')
+            if data is None:
+                return
+            element = etree.fromstring(data)
+            memory.titles.set(name, element, len(data))
+        return copy.deepcopy(element)
+    data = get_cache_backend().get(_title_key(name, ext))
+    if data is None:
         return
-    if ext == 'json':
-        return json.load(open(file))
-    elif ext == 'xml':
-        return etree.fromstring(open(file).read())
-    else:
-        return open(file).read()
+    data = data.decode('utf-8')
+    return json.loads(data) if ext == 'json' else data
 
 
-def _get_csv_reader(name):
-    return csv.DictReader(open(get_word_cache_path(name)), fieldnames=WORDS_CSV_FIELDS, dialect=WORDS_CSV_DIALECT)
+def title_cache_age(name, ext='json'):
+    """Seconds since the title was saved or revalidated. None if it is not in cache"""
+    if ext == 'xml':
+        return get_title_store().age(str(name))
+    return get_cache_backend().age(_title_key(name, ext))
 
 
-def _save_word_cache(path, lines):
-    f = open(path, 'w')
-    d = csv.DictWriter(f, fieldnames=WORDS_CSV_FIELDS, dialect=WORDS_CSV_DIALECT)
-    d.writerows(lines)
-    f.close()
+def title_cache_ids(ext='json'):
+    """Ids of the titles in cache"""
+    if ext == 'xml':
+        return get_title_store().ids()
+    return _backend_ids(get_cache_backend(), ext)
+
+
+def touch_title_cache(name, ext='json'):
+    if ext == 'xml':
+        return get_title_store().touch(str(name))
+    get_cache_backend().touch(_title_key(name, ext))
+
+
+def save_title_validators(name, headers):
+    """Save the ETag and Last-Modified headers of the response of a title"""
+    validators = {'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified')}
+    if any(validators.values()):
+        save_title_cache(validators, '{}.validators'.format(name), 'json')
+
+
+def load_title_validators(name):
+    return load_title_cache('{}.validators'.format(name), 'json') or {}
+
+
+def save_title_miss(name):
+    """Remember that the API has no title with this id (<warning> response)"""
+    save_title_cache({}, '{}.missing'.format(name), 'json')
+
+
+def title_miss_age(name):
+    """Seconds since the title was saved as missing. None if it is not"""
+    return title_cache_age('{}.missing'.format(name), 'json')
 
 
 def _create_word_cache_line(name, label, titles):
     return {'name': name, 'label': label, 'titles': titles, 'updated_at': datetime.datetime.now().isoformat()}
 
 
+class WordCache(object):
+    """Base class for the word cache backends. The entries are keyed by (name, label) and
+    are dicts with the WORDS_CSV_FIELDS keys.
+    """
+
+    def load(self, name, label):
+        raise NotImplementedError
+
+    def save(self, name, label, titles):
+        raise NotImplementedError
+
+
+class CsvWordCache(WordCache):
+    """Legacy backend: the entries are split in 256 csv files by the hash of the name."""
+
+    def __init__(self, directory=WORDS_CACHE_DIR):
+        self.directory = directory
+
+    def get_path(self, name):
+        return get_word_cache_path(name, self.directory)
+
+    def _read(self, path):
+        if not os.path.lexists(path):
+            return []
+        with open(path) as f:
+            return list(csv.DictReader(f, fieldnames=WORDS_CSV_FIELDS, dialect=WORDS_CSV_DIALECT))
+
+    def _write(self, path, lines):
+        f = six.StringIO()
+        csv.DictWriter(f, fieldnames=WORDS_CSV_FIELDS, dialect=WORDS_CSV_DIALECT).writerows(lines)
+        data = f.getvalue()
+        makedirs(self.directory, exist_ok=True)
+        atomic_write(path, data.encode('utf-8') if isinstance(data, six.text_type) else data)
+
+    def entries(self):
+        if not os.path.isdir(self.directory):
+            return
+        for file in sorted(os.listdir(self.directory)):
+            if file.endswith('.csv'):
+                for line in self._read(os.path.join(self.directory, file)):
+                    yield line
+
+    def load(self, name, label):
+        for line in self._read(self.get_path(name)):
+            if line['name'] == name and line['label'] == label:
+                return line
+
+    def save(self, name, label, titles):
+        path = self.get_path(name)
+        lines = [line for line in self._read(path) if (line['name'], line['label']) != (name, label)]
+        lines.append(_create_word_cache_line(name, label, titles))
+        self._write(path, lines)
+
+
+class SqliteWordCache(SqliteDatabase, WordCache):
+    """Indexed backend on a SQLite database. The csv files of CsvWordCache found in
+    migrate_from are imported when the database is created.
+    """
+
+    def __init__(self, path=WORDS_DB, migrate_from=WORDS_CACHE_DIR):
+        super(SqliteWordCache, self).__init__(path)
+        self.migrate_from = migrate_from
+
+    def create_tables(self, connection):
+        connection.execute('CREATE TABLE IF NOT EXISTS words (name TEXT NOT NULL, label TEXT NOT NULL, '
+                           'titles TEXT NOT NULL, updated_at TEXT, PRIMARY KEY (name, label))')
+        if self.migrate_from:
+            self._insert(CsvWordCache(self.migrate_from).entries())
+
+    def _insert(self, lines):
+        self._connection.executemany(
+            'INSERT OR REPLACE INTO words (name, label, titles, updated_at) VALUES (?, ?, ?, ?)',
+            ((line['name'], line['label'], line['titles'] or '', line['updated_at']) for line in lines)
+        )
+
+    def load(self, name, label):
+        if self._connection is None and not os.path.lexists(self.path):
+            # La base de datos sólo se crea al guardar. Hasta entonces, se leen los csv antiguos
+            return CsvWordCache(self.migrate_from).load(name, label) if self.migrate_from else None
+        with self.lock:
+            row = self.connection.execute('SELECT titles, updated_at FROM words WHERE name = ? AND label = ?',
+                                          (name, label)).fetchone()
+        if row is not None:
+            return {'name': name, 'label': label, 'titles': row[0], 'updated_at': row[1]}
+
+    def save(self, name, label, titles):
+        with self.lock:
+            connection = self.connection
+            with connection:
+                self._insert([_create_word_cache_line(name, label, titles)])
+
+
+class BackendWordCache(WordCache):
+    """Word cache on a CacheBackend. Each entry is a json document with the key
+    words/<label>/<hash of the name>, so concurrent saves of different words do not collide.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get_key(self, name, label):
+        return 'words/{}/{}'.format(label, hashlib.md5(name.encode('utf-8')).hexdigest())
+
+    def load(self, name, label):
+        data = self.backend.get(self.get_key(name, label))
+        if data is not None:
+            line = json.loads(data.decode('utf-8'))
+            # Colisión del hash
+            if line['name'] == name:
+                return line
+
+    def save(self, name, label, titles):
+        line = _create_word_cache_line(name, label, titles)
+        self.backend.set(self.get_key(name, label), json.dumps(line).encode('utf-8'))
+
+
+word_cache = None
+
+
+def get_word_cache():
+    global word_cache
+    if word_cache is None:
+        word_cache = SqliteWordCache()
+    return word_cache
+
+
+def set_word_cache(backend):
+    global word_cache
+    word_cache = backend
+
+
 def save_word_cache(name, label, titles):
     titles = ','.join([str(title) for title in titles])
-    path = get_word_cache_path(name)
-    lines = list(_get_csv_reader(name)) if os.path.lexists(path) else []
-    new_line = _create_word_cache_line(name, label, titles)
-    for i, line in enumerate(lines):
-        if not line['name'] == name and line['label'] == label:
-            continue
-        lines[i] = new_line
-        return _save_word_cache(path, lines)
-    lines.append(new_line)
-    _save_word_cache(path, lines)
+    get_word_cache().save(name, label, titles)
+
+
+def word_cache_age(name, label):
+    """Seconds since the words search was saved. None if it is not in cache"""
+    line = get_word_cache().load(name, label)
+    if line is not None and line['updated_at']:
+        updated_at = datetime.datetime.strptime(line['updated_at'][:19], '%Y-%m-%dT%H:%M:%S')
+        return (datetime.datetime.now() - updated_at).total_seconds()
 
 
 def load_word_cache(name, label):
-    path = get_word_cache_path(name)
-    lines = list(_get_csv_reader(name)) if os.path.lexists(path) else []
-    for line in lines:
-        if line['name'] == name and line['label'] == label:
-            return line['titles']
+    line = get_word_cache().load(name, label)
+    if metrics.registry.enabled:
+        metrics.registry.increment('cache_misses_total' if line is None else 'cache_hits_total', layer='words')
+    if line is not None:
+        return line['titles']
@@ -0,0 +1,114 @@
+import time
+
+from anime_news_network import metrics
+from anime_news_network.ratelimit import RateLimiter
+
+URL = 'http://cdn.animenewsnetwork.com/encyclopedia/api.xml'
+REPORTS_URL = 'http://cdn.animenewsnetwork.com/encyclopedia/reports.xml'
+# Segundos entre petición y petición. Es obligatorio para la API de ANN
+DELAY = 1
+TIMEOUT = 30
+RETRIES = 3
+BACKOFF_FACTOR = 2
+MAX_BACKOFF = 120
+POOL_SIZE = 4
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+def get_retry_after(response):
+    """Seconds to wait according to the Retry-After header (seconds or HTTP date)"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return
+    if value.strip().isdigit():
+        return int(value)
+    from email.utils import parsedate_tz, mktime_tz
+    date = parsedate_tz(value)
+    if date is not None:
+        return max(mktime_tz(date) - time.time(), 0)
+
+
+class Client(object):
+    """Client of the ANN API. Each client has its own rate limiter, shared by all the
+    threads that use it, and a pooled keep-alive session. The requests that fail with
+    a connection error or a RETRY_STATUS status are retried with exponential backoff.
+    """
+
+    def __init__(self, url=URL, delay=DELAY, rate_limiter=None, timeout=TIMEOUT, retries=RETRIES,
+                 backoff_factor=BACKOFF_FACTOR, pool_size=POOL_SIZE, reports_url=REPORTS_URL):
+        self.url = url
+        self.reports_url = reports_url
+        self.rate_limiter = rate_limiter or RateLimiter(1.0 / delay)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        # Importación diferida: requests es lo más lento de importar del paquete, y sólo
+        # hace falta al crear el cliente (en la primera petición de search)
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_backoff(self, attempt):
+        return min(self.backoff_factor * (2 ** attempt), MAX_BACKOFF)
+
+    def request(self, query_search, headers=None, url=None, **kwargs):
+        """Return the response of the API (or of another url of ANN, like reports_url). A
+        304 (Not Modified) response is returned as is, other error statuses raise
+        requests.HTTPError once the retries are exhausted.
+        """
+        import requests
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            start = metrics.timer() if metrics.registry.enabled else None
+            try:
+                response = self.session.get(url or self.url, params=query_search, headers=headers,
+                                            timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if metrics.registry.enabled:
+                    metrics.registry.increment('request_errors_total', error=e.__class__.__name__)
+                if attempt >= self.retries:
+                    raise
+                wait = self.get_backoff(attempt)
+            else:
+                if start is not None:
+                    self._observe(response, metrics.timer() - start, kwargs.get('stream'))
+                if response.status_code not in RETRY_STATUS or attempt >= self.retries:
+                    break
+                wait = get_retry_after(response)
+                # Un Retry-After enorme no bloquea al llamador más que la espera máxima
+                wait = self.get_backoff(attempt) if wait is None else min(wait, MAX_BACKOFF)
+                response.close()
+            if metrics.registry.enabled:
+                metrics.registry.increment('request_retries_total')
+            time.sleep(wait)
+            attempt += 1
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+    def _observe(self, response, seconds, stream=False):
+        registry = metrics.registry
+        registry.observe('request_seconds', seconds, status=response.status_code)
+        # Sin leer el cuerpo de las respuestas en streaming
+        length = response.headers.get('Content-Length') if stream else len(response.content)
+        if length is not None:
+            registry.observe('request_bytes', int(length))
+
+    def revalidate(self, query_search, etag=None, last_modified=None):
+        """Conditional request. Return None if the resource has not been modified"""
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        response = self.request(query_search, headers)
+        if response.status_code != 304:
+            return response
+
+    def close(self):
+        self.session.close()
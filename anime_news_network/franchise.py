@@ -0,0 +1,116 @@
+from collections import OrderedDict
+
+from anime_news_network import memory
+from anime_news_network.cache import load_title_cache
+from anime_news_network.search import search_many
+
+# Enlaces entre títulos: nombre del elemento xml
+LINKS = OrderedDict([('prev', 'related-prev'), ('next', 'related-next')])
+
+
+def get_links(element):
+    """(prev ids, next ids) of a title element"""
+    return tuple([int(x.get('id')) for x in element.findall(tag) if x.get('id', '').isdigit()]
+                 for tag in LINKS.values())
+
+
+def get_adjacency(ids):
+    """Return a dict id: (prev ids, next ids). The links are taken from the memory cache,
+    the title cache or, for the missing titles, requested together with search_many(). The
+    ids that do not exist in the API are omitted.
+    """
+    adjacency = {}
+    missing = []
+    for id in ids:
+        links = memory.related.get(str(id))
+        if links is None:
+            element = load_title_cache(id, ext='xml')
+            if element is None:
+                missing.append(id)
+                continue
+            links = get_links(element)
+            memory.related.set(str(id), links)
+        adjacency[id] = links
+    if missing:
+        for item in search_many(missing):
+            links = get_links(item.data)
+            memory.related.set(str(item.id), links)
+            adjacency[item.id] = links
+    return adjacency
+
+
+class Franchise(object):
+    """Titles connected by related-prev/related-next links to the root title. Only the ids
+    and the links are kept; the titles are loaded with titles(). depths is an ordered dict
+    id: distance to the root. truncated is True if the walk was stopped by the limits.
+    """
+
+    def __init__(self, root, depths, adjacency, truncated=False):
+        self.root = root
+        self.depths = depths
+        self.adjacency = adjacency
+        self.truncated = truncated
+
+    @property
+    def ids(self):
+        return list(self.depths)
+
+    def edges(self):
+        """Yield the links (id, 'prev' or 'next', related id) of the walked titles"""
+        for id, links in self.adjacency.items():
+            for name, related in zip(LINKS, links):
+                for related_id in related:
+                    yield id, name, related_id
+
+    def titles(self):
+        """Results with the titles, in walk order"""
+        return search_many(self.ids)
+
+    def __contains__(self, id):
+        return id in self.depths
+
+    def __iter__(self):
+        return iter(self.depths)
+
+    def __len__(self):
+        return len(self.depths)
+
+    def __repr__(self):
+        return '<Franchise {} ({} titles)>'.format(self.root, len(self))
+
+
+def walk(id, max_depth=None, max_titles=None):
+    """Breadth-first walk of the related titles from a title id. The links of each level
+    are fetched together (the titles not in cache are requested in batches of MAX_IDS ids).
+    Each title is visited once, so the cycles of the links are not followed. max_depth
+    limits the distance to the root and max_titles the number of titles.
+    """
+    id = int(id)
+    depths = OrderedDict([(id, 0)])
+    adjacency = OrderedDict()
+    frontier = [id]
+    depth = 0
+    truncated = False
+    while frontier:
+        if max_depth is not None and depth >= max_depth:
+            truncated = True
+            break
+        links = get_adjacency(frontier)
+        next_frontier = []
+        for current in frontier:
+            if current not in links:
+                # Enlace a un título que no existe
+                del depths[current]
+                continue
+            adjacency[current] = links[current]
+            for related_id in links[current][0] + links[current][1]:
+                if related_id in depths:
+                    continue
+                if max_titles is not None and len(depths) >= max_titles:
+                    truncated = True
+                    continue
+                depths[related_id] = depth + 1
+                next_frontier.append(related_id)
+        frontier = next_frontier
+        depth += 1
+    return Franchise(id, depths, adjacency, truncated)
@@ -0,0 +1,163 @@
+import datetime
+import logging
+import threading
+
+from six.moves import queue
+
+from anime_news_network.results import Vintage
+
+# Segundos que se consideran frescos los títulos en emisión, los terminados y las búsquedas
+# por palabras
+AIRING_TTL = 6 * 60 * 60
+FINISHED_TTL = 90 * 24 * 60 * 60
+WORDS_TTL = 7 * 24 * 60 * 60
+# Segundos tras el ttl en los que una entrada caducada aún se sirve. Después se vuelve a pedir
+# antes de responder
+STALE_TTL = 7 * 24 * 60 * 60
+# Días desde el estreno en los que un título sin fecha de fin se considera en emisión
+RECENT_DAYS = 365
+# Ids que se piden juntos al refrescar en segundo plano
+REFRESH_BATCH = 50
+
+FRESH, STALE, EXPIRED = 'fresh', 'stale', 'expired'
+
+logger = logging.getLogger('anime_news_network.freshness')
+
+
+def is_airing(item, today=None):
+    """Whether a title is still being released, judged by its vintages: completed after
+    today or, without completed date, released in the last RECENT_DAYS days. The titles
+    without vintages are not.
+    """
+    today = today or datetime.date.today()
+    vintages = [x for x in item.get('vintages', []) if isinstance(x, Vintage)]
+    completed = [x['completed_date'] for x in vintages if 'completed_date' in x]
+    if completed:
+        return max(completed) >= today.isoformat()
+    released = [x['release_date'] for x in vintages if 'release_date' in x]
+    if not released:
+        return False
+    return max(released) >= (today - datetime.timedelta(days=RECENT_DAYS)).isoformat()
+
+
+class FreshnessPolicy(object):
+    """Time to live of the cached titles and words searches of a label. The entries older
+    than their ttl are stale: they are served while they are refreshed in background.
+    After stale_ttl more seconds they are expired and requested again before answering
+    (stale_ttl=None: never).
+    """
+
+    def __init__(self, airing_ttl=AIRING_TTL, finished_ttl=FINISHED_TTL, words_ttl=WORDS_TTL,
+                 stale_ttl=STALE_TTL):
+        self.airing_ttl = airing_ttl
+        self.finished_ttl = finished_ttl
+        self.words_ttl = words_ttl
+        self.stale_ttl = stale_ttl
+
+    def title_ttl(self, item):
+        return self.airing_ttl if is_airing(item) else self.finished_ttl
+
+    def state(self, age, ttl):
+        if age is None or ttl is None or age < ttl:
+            return FRESH
+        elif self.stale_ttl is None or age < ttl + self.stale_ttl:
+            return STALE
+        return EXPIRED
+
+    def title_state(self, item, age):
+        return self.state(age, self.title_ttl(item))
+
+    def words_state(self, age):
+        return self.state(age, self.words_ttl)
+
+
+# label: FreshnessPolicy. Los títulos usan la de su tipo (anime o manga)
+policies = {
+    'anime': FreshnessPolicy(),
+    'manga': FreshnessPolicy(airing_ttl=24 * 60 * 60),
+    'title': FreshnessPolicy(),
+}
+
+
+def get_policy(label):
+    return policies.get(label) or policies['title']
+
+
+class Refresher(object):
+    """Background thread that requests again the stale cache entries, through the client of
+    anime_news_network.search (and its rate limiter). The keys are title ids or (query, label)
+    words searches. The titles with validators are revalidated (search.refresh()), the others
+    are requested in groups of REFRESH_BATCH. The keys already queued are
+    not added again. Only used with search.BACKGROUND_REFRESH; AsyncSearch has its own.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def add(self, key):
+        with self.lock:
+            if key in self.pending:
+                return
+            self.pending.add(key)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='anime_news_network.refresher')
+                self.thread.daemon = True
+                self.thread.start()
+        self.queue.put(key)
+
+    def wait(self):
+        """Block until all the queued entries have been refreshed"""
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            keys = [self.queue.get()]
+            while len(keys) < REFRESH_BATCH:
+                try:
+                    keys.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.refresh(keys)
+            finally:
+                with self.lock:
+                    self.pending.difference_update(keys)
+                for _ in keys:
+                    self.queue.task_done()
+
+    def refresh(self, keys):
+        from anime_news_network.cache import load_title_validators
+        from anime_news_network.search import search_many, refresh, _search_request
+        ids = [key for key in keys if not isinstance(key, tuple)]
+        searches = [key for key in keys if isinstance(key, tuple)]
+        # Con ETag o Last-Modified basta una petición condicional (304 si no ha cambiado)
+        validated = [id for id in ids if load_title_validators(id)]
+        ids = [id for id in ids if id not in validated]
+        for id in validated:
+            try:
+                refresh(id)
+            except Exception:
+                logger.exception('Error refreshing the title %s', id)
+        if ids:
+            try:
+                search_many(ids, cache=False)
+            except Exception:
+                logger.exception('Error refreshing the titles %s', ids)
+        for query, label in searches:
+            try:
+                _search_request(query, label)
+            except Exception:
+                logger.exception('Error refreshing the search %s (%s)', query, label)
+
+
+refresher = None
+
+
+def get_refresher():
+    global refresher
+    if refresher is None:
+        refresher = Refresher()
+    return refresher
@@ -0,0 +1,145 @@
+import re
+import time
+import unicodedata
+
+import six
+from lxml import etree
+
+from anime_news_network.backends import SqliteDatabase
+from anime_news_network.cache import INDEX_DB, title_cache_listeners, title_cache_ids, load_title_cache, \
+    title_cache_age
+
+GRAM_SIZE = 3
+# xpath de los nombres indexados de cada título
+NAMES_XPATH = "info[@type='Main title']|info[@type='Alternative title']|episode/title"
+
+
+def normalize(text):
+    """Lowercase text without accents, with the punctuation replaced by spaces"""
+    text = unicodedata.normalize('NFKD', six.text_type(text))
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return ' '.join(re.split(r'\W+', text, flags=re.UNICODE)).strip()
+
+
+def get_grams(text):
+    """Set of the n-grams (GRAM_SIZE characters) of a normalized text"""
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def get_names(element):
+    names = [element.get('name')] + [x.text for x in element.xpath(NAMES_XPATH)]
+    return {normalize(name) for name in names if name}
+
+
+class TitleIndex(SqliteDatabase):
+    """Inverted index of n-grams of the names of the cached titles (main title, alternative
+    titles and episode titles). It answers the same substring searches than '~query' in the
+    ANN API. The index is updated each time a title is saved in the cache after install(),
+    and before the first search the titles saved since they were indexed (by other
+    processes, or before the index existed) are indexed with update().
+    """
+    version = 2
+
+    def __init__(self, path=INDEX_DB):
+        super(TitleIndex, self).__init__(path)
+        self.updated = False
+
+    def create_tables(self, connection):
+        connection.execute('CREATE TABLE IF NOT EXISTS names (title INTEGER NOT NULL, label TEXT NOT NULL, '
+                           'name TEXT NOT NULL)')
+        connection.execute('CREATE INDEX IF NOT EXISTS names_title ON names (title)')
+        connection.execute('CREATE TABLE IF NOT EXISTS grams (gram TEXT NOT NULL, title INTEGER NOT NULL, '
+                           'PRIMARY KEY (gram, title)) WITHOUT ROWID')
+        connection.execute('CREATE INDEX IF NOT EXISTS grams_title ON grams (title)')
+        # Fecha en la que se indexó cada título
+        connection.execute('CREATE TABLE IF NOT EXISTS indexed (title INTEGER PRIMARY KEY, '
+                           'indexed_at REAL NOT NULL)')
+
+    def install(self):
+        if self.add not in title_cache_listeners:
+            title_cache_listeners.append(self.add)
+        return self
+
+    def uninstall(self):
+        if self.add in title_cache_listeners:
+            title_cache_listeners.remove(self.add)
+
+    def add(self, id, element):
+        if isinstance(element, (six.string_types, six.binary_type)):
+            element = etree.fromstring(element)
+        id = int(id)
+        label = element.tag
+        names = get_names(element)
+        grams = set()
+        for name in names:
+            grams.update(get_grams(name))
+        with self.lock:
+            connection = self.connection
+            with connection:
+                self._remove(id)
+                connection.executemany('INSERT INTO names (title, label, name) VALUES (?, ?, ?)',
+                                       [(id, label, name) for name in names])
+                connection.executemany('INSERT INTO grams (gram, title) VALUES (?, ?)',
+                                       [(gram, id) for gram in grams])
+                connection.execute('INSERT INTO indexed (title, indexed_at) VALUES (?, ?)', (id, time.time()))
+
+    def remove(self, id):
+        with self.lock:
+            with self.connection:
+                self._remove(int(id))
+
+    def _remove(self, id):
+        self._connection.execute('DELETE FROM names WHERE title = ?', (id,))
+        self._connection.execute('DELETE FROM grams WHERE title = ?', (id,))
+        self._connection.execute('DELETE FROM indexed WHERE title = ?', (id,))
+
+    def rebuild(self):
+        """Index all the titles in the cache"""
+        for id in title_cache_ids('xml'):
+            element = load_title_cache(id, 'xml')
+            if element is not None:
+                self.add(id, element)
+
+    def update(self):
+        """Index the cached titles not indexed or saved after they were indexed"""
+        with self.lock:
+            indexed = dict(self.connection.execute('SELECT title, indexed_at FROM indexed').fetchall())
+        now = time.time()
+        for id in title_cache_ids('xml'):
+            age = title_cache_age(id, 'xml')
+            if age is None or (id in indexed and indexed[id] >= now - age):
+                continue
+            element = load_title_cache(id, 'xml')
+            if element is not None:
+                self.add(id, element)
+        self.updated = True
+
+    def search(self, query, label='title'):
+        """Return the sorted ids of the titles whose names contain the query. None if the
+        query is too short to use the index.
+        """
+        if not self.updated:
+            self.update()
+        query = normalize(query)
+        grams = get_grams(query)
+        if not grams:
+            return
+        sql = ('SELECT title, label, name FROM names WHERE title IN '
+               '(SELECT title FROM grams WHERE gram IN ({}) GROUP BY title HAVING COUNT(*) = ?)').format(
+            ','.join('?' * len(grams)))
+        with self.lock:
+            rows = self.connection.execute(sql, list(grams) + [len(grams)]).fetchall()
+        return sorted({title for title, title_label, name in rows
+                       if query in name and label in ('title', title_label)})
+
+
+
+title_index = None
+
+
+def get_title_index():
+    """Default index. It is installed to be updated with the cache"""
+    global title_index
+    if title_index is None:
+        title_index = TitleIndex().install()
+    return title_index
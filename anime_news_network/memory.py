@@ -0,0 +1,103 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+monotonic = getattr(time, 'monotonic', time.time)
+# Valor por defecto de los argumentos de configure() (None es un valor válido: sin límite)
+UNCHANGED = object()
+
+
+class MemoryCache(object):
+    """Thread safe LRU cache in memory. The size can be bounded by number of entries
+    (max_entries) and/or by the sum of the sizes of the values (max_bytes). The entries
+    older than ttl seconds are expired.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=None, ttl=None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof or sys.getsizeof
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def configure(self, max_entries=UNCHANGED, max_bytes=UNCHANGED, ttl=UNCHANGED):
+        """Change the bounds passed (None removes the bound). The others are kept"""
+        with self.lock:
+            if max_entries is not UNCHANGED:
+                self.max_entries = max_entries
+            if max_bytes is not UNCHANGED:
+                self.max_bytes = max_bytes
+            if ttl is not UNCHANGED:
+                self.ttl = ttl
+            self._shrink()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None and entry[2] is not None and entry[2] < monotonic():
+                self.bytes -= entry[1]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            # Lo vuelvo a insertar para que pase a ser el más reciente
+            self.entries[key] = entry
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, size=None):
+        size = self.sizeof(value) if size is None and self.max_bytes else (size or 0)
+        expires = monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = (value, size, expires)
+            self.bytes += size
+            self._shrink()
+
+    def invalidate(self, key):
+        with self.lock:
+            self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def _shrink(self):
+        while self.entries and ((self.max_entries and len(self.entries) > self.max_entries) or
+                                (self.max_bytes and self.bytes > self.max_bytes)):
+            self.bytes -= self.entries.popitem(last=False)[1][1]
+
+    def stats(self):
+        return {'entries': len(self.entries), 'bytes': self.bytes, 'hits': self.hits, 'misses': self.misses}
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# Elementos xml de los títulos, tal y como están en la caché de archivos
+titles = MemoryCache()
+# Objetos Manganime ya construidos. Se comparten entre búsquedas, no deben modificarse
+manganimes = MemoryCache()
+# Ids relacionados de cada título: (related-prev, related-next)
+related = MemoryCache(max_entries=65536)
+
+
+def invalidate_title(name):
+    name = str(name)
+    titles.invalidate(name)
+    manganimes.invalidate(name)
+    related.invalidate(name)
@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import defaultdict
+
+timer = getattr(time, 'perf_counter', time.time)
+
+PREFIX = 'ann_'
+# Límites superiores de los buckets de los histogramas: en segundos y, los *_bytes, en bytes
+SECONDS_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class NullRegistry(object):
+    """Default registry: the metrics are discarded. The instrumented code checks enabled
+    before measuring, so it has no cost. Subclasses can override increment() and observe()
+    to send the events elsewhere.
+
+    Metrics: cache_hits_total and cache_misses_total (label layer), ratelimit_wait_seconds,
+    request_seconds (label status), request_bytes, request_retries_total,
+    request_errors_total (label error), parse_seconds, parsed_titles_total and
+    search_seconds (label source).
+    """
+    enabled = False
+
+    def increment(self, name, value=1, **labels):
+        pass
+
+    def observe(self, name, value, **labels):
+        pass
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    labels = list(labels) + list(extra)
+    if not labels:
+        return ''
+    escape = lambda x: str(x).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join('{}="{}"'.format(key, escape(value)) for key, value in labels) + '}'
+
+
+def _format_number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Registry(NullRegistry):
+    """In-memory counters and histograms, exported with to_prometheus()"""
+    enabled = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        # (name, labels): [cuenta de cada bucket, suma, cuenta]
+        self.histograms = {}
+
+    def get_buckets(self, name):
+        return BYTES_BUCKETS if name.endswith('_bytes') else SECONDS_BUCKETS
+
+    def increment(self, name, value=1, **labels):
+        with self.lock:
+            self.counters[(name, _labels_key(labels))] += value
+
+    def observe(self, name, value, **labels):
+        key = (name, _labels_key(labels))
+        buckets = self.get_buckets(name)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, limit in enumerate(buckets):
+                if value <= limit:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def _memory_counters(self):
+        # Aciertos y fallos de las cachés en memoria, que ya los cuentan
+        from anime_news_network import memory
+        counters = {}
+        for layer in ('titles', 'manganimes', 'related'):
+            stats = getattr(memory, layer).stats()
+            counters[('cache_hits_total', (('layer', 'memory_' + layer),))] = stats['hits']
+            counters[('cache_misses_total', (('layer', 'memory_' + layer),))] = stats['misses']
+        return counters
+
+    def to_prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {key: ([x for x in value[0]], value[1], value[2]) for key, value in self.histograms.items()}
+        counters.update(self._memory_counters())
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            lines.append('# TYPE {}{} counter'.format(PREFIX, name))
+            for (key, labels), value in sorted(counters.items()):
+                if key == name:
+                    lines.append('{}{}{} {}'.format(PREFIX, name, _format_labels(labels), _format_number(value)))
+        for name in sorted({name for name, _ in histograms}):
+            lines.append('# TYPE {}{} histogram'.format(PREFIX, name))
+            buckets = self.get_buckets(name)
+            for (key, labels), (counts, total, count) in sorted(histograms.items()):
+                if key != name:
+                    continue
+                for limit, value in zip(buckets, counts):
+                    lines.append('{}{}_bucket{} {}'.format(PREFIX, name, _format_labels(labels, [('le', limit)]), value))
+                lines.append('{}{}_bucket{} {}'.format(PREFIX, name, _format_labels(labels, [('le', '+Inf')]), count))
+                lines.append('{}{}_sum{} {}'.format(PREFIX, name, _format_labels(labels), _format_number(total)))
+                lines.append('{}{}_count{} {}'.format(PREFIX, name, _format_labels(labels), count))
+        return '\n'.join(lines) + '\n'
+
+
+registry = NullRegistry()
+
+
+def get_registry():
+    return registry
+
+
+def set_registry(value):
+    """Set the registry of the metrics, for example Registry() to collect them"""
+    global registry
+    registry = value
@@ -0,0 +1,108 @@
+"""Parse of the cached titles in a pool of processes.
+
+The parent process reads the xml of the titles from the title store and sends them in
+chunks to the workers, which parse them and return Records (see
+anime_news_network.records): compact and picklable, without lxml elements. The workers
+do not use the title store, so they work with any multiprocessing start method and any
+store (set_title_store, set_cache_backend).
+"""
+import multiprocessing
+from collections import deque
+
+from six.moves import queue
+
+from anime_news_network.cache import get_title_store, title_cache_ids
+
+# Títulos que se envían a cada worker en una tarea
+CHUNK_SIZE = 200
+# Tareas pendientes por worker: mantiene ocupados a los workers sin leer toda la caché en memoria
+TASKS_PER_WORKER = 2
+
+
+def _read_chunks(ids, chunk_size):
+    """Lists of xml of the cached titles. The ids not in cache are omitted"""
+    store = get_title_store()
+    chunk = []
+    for id in ids:
+        data = store.load(str(id))
+        if data is None:
+            continue
+        chunk.append(data)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_chunk(chunk):
+    """Records of a list of xml titles. Executed in the workers"""
+    from lxml import etree
+    from anime_news_network.results import Results
+    ann = etree.Element('ann')
+    for data in chunk:
+        ann.append(etree.fromstring(data))
+    return Results(ann).to_records()
+
+
+def _imap(pool, chunks, tasks):
+    # Como Pool.imap, pero leyendo los chunks a medida que los workers terminan
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.apply_async(parse_chunk, (chunk,)))
+        if len(pending) >= tasks:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def _imap_unordered(pool, chunks, tasks):
+    done = queue.Queue()
+    pending = 0
+    chunks = iter(chunks)
+    while True:
+        for chunk in chunks:
+            pool.apply_async(parse_chunk, (chunk,), callback=done.put, error_callback=done.put)
+            pending += 1
+            if pending >= tasks:
+                break
+        if not pending:
+            return
+        records = done.get()
+        pending -= 1
+        if isinstance(records, Exception):
+            raise records
+        yield records
+
+
+def parse_cache_parallel(ids, workers=None, chunk_size=CHUNK_SIZE, ordered=True):
+    """Parse the cached titles of ids in a pool of processes (workers, by default one per
+    CPU). Yields a Record per title, in the order of ids or, with ordered=False, as the
+    chunks are parsed. The ids not in cache are omitted.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    chunks = _read_chunks(ids, chunk_size)
+    pool = multiprocessing.Pool(workers)
+    try:
+        imap = _imap if ordered else _imap_unordered
+        for records in imap(pool, chunks, workers * TASKS_PER_WORKER):
+            for record in records:
+                yield record
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def iter_catalog(ids=None, parallel=False, workers=None, chunk_size=CHUNK_SIZE, ordered=True):
+    """Records of the cached titles (all of them by default). With parallel=True they are
+    parsed in a pool of processes (see parse_cache_parallel).
+    """
+    ids = title_cache_ids('xml') if ids is None else ids
+    if parallel:
+        for record in parse_cache_parallel(ids, workers, chunk_size, ordered):
+            yield record
+        return
+    for chunk in _read_chunks(ids, chunk_size):
+        for record in parse_chunk(chunk):
+            yield record
@@ -0,0 +1,43 @@
+import threading
+import time
+
+from anime_news_network import metrics
+
+monotonic = getattr(time, 'monotonic', time.time)
+
+
+class RateLimiter(object):
+    """Thread safe limiter of rate calls per second. Each caller reserves the next free
+    slot in arrival order and waits for it, so the callers are served in FIFO order and
+    an exception in a call never blocks the following ones.
+    """
+
+    def __init__(self, rate=1.0, clock=monotonic, sleep=time.sleep):
+        self.interval = 1.0 / rate
+        self.clock = clock
+        self.sleep = sleep
+        self.next_slot = None
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        with self.lock:
+            now = self.clock()
+            slot = now if self.next_slot is None else max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        return slot
+
+    def acquire(self):
+        slot = self.reserve()
+        delay = slot - self.clock()
+        if metrics.registry.enabled:
+            metrics.registry.observe('ratelimit_wait_seconds', max(delay, 0))
+        if delay > 0:
+            self.sleep(delay)
+        return slot
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
@@ -0,0 +1,86 @@
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+from anime_news_network.results import ItemBase
+
+# keys: (keys, {key: position}). Compartidos por todos los registros con las mismas claves
+_fields = {}
+
+
+def get_fields(keys):
+    keys = tuple(keys)
+    fields = _fields.get(keys)
+    if fields is None:
+        fields = _fields[keys] = (keys, {key: i for i, key in enumerate(keys)})
+    return fields
+
+
+class Record(Mapping):
+    """Compact read-only copy of an Item. The values are stored once in a tuple and the keys
+    are shared by all the records with the same keys. Supports the mapping access, the
+    attribute access and to_json() of the Item.
+    """
+    __slots__ = ('_fields', '_values')
+
+    def __init__(self, keys, values):
+        self._fields = get_fields(keys)
+        self._values = tuple(values)
+
+    def __getitem__(self, key):
+        return self._values[self._fields[1][key]]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._values[self._fields[1][name]]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __contains__(self, key):
+        return key in self._fields[1]
+
+    def __iter__(self):
+        return iter(self._fields[0])
+
+    def __len__(self):
+        return len(self._values)
+
+    def __reduce__(self):
+        # Los campos se serializan una vez por pickle (memo) y no se buscan al cargar
+        return _restore, (self._fields, self._values)
+
+    def __repr__(self):
+        return repr(self.to_json())
+
+    def to_json(self):
+        return {key: to_json(value) for key, value in zip(self._fields[0], self._values)}
+
+
+def _restore(fields, values):
+    record = Record.__new__(Record)
+    record._fields = fields
+    record._values = values
+    return record
+
+
+def to_json(value):
+    if isinstance(value, Record):
+        return value.to_json()
+    elif isinstance(value, list):
+        return [to_json(x) for x in value]
+    return value
+
+
+def compact(value):
+    """Convert an Item (and its children) into Records. Lists (including Pictures and
+    Results) are converted into lists.
+    """
+    if isinstance(value, dict) and isinstance(value, ItemBase):
+        items = list(dict.items(value.load()))
+        return Record([key for key, _ in items], [compact(x) for _, x in items])
+    elif isinstance(value, list):
+        return [compact(x) for x in value]
+    return value
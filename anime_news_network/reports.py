@@ -0,0 +1,142 @@
+"""Reports of the ANN encyclopedia (reports.xml). The report REPORT_TITLES lists all the
+titles, the most recently added first, with rows like::
+
+    <report skipped="0" listed="2">
+      <item><id>2</id><gid>...</gid><type>TV</type><name>...</name><precision>TV</precision>
+            <vintage>2016-04-07</vintage></item>
+      ...
+    </report>
+
+The pages (nskip/nlist) are requested with the client of anime_news_network.search, so
+they share its rate limiter.
+"""
+import json
+import zlib
+from collections import namedtuple
+
+from lxml import etree
+
+from anime_news_network.cache import get_cache_backend
+from anime_news_network.records import Record
+
+# Lista de todos los títulos, los últimos añadidos primero
+REPORT_TITLES = 155
+# Filas por página (nlist)
+PAGE_SIZE = 1000
+INT_FIELDS = ('id', 'gid')
+
+Changes = namedtuple('Changes', ['added', 'modified', 'removed'])
+
+
+def _value(element):
+    text = (element.text or '').strip()
+    return int(text) if element.tag in INT_FIELDS and text.isdigit() else text
+
+
+def parse_report(data):
+    """Records of the rows (<item>) of a report response"""
+    rows = []
+    for item in etree.fromstring(data).iterfind('item'):
+        rows.append(Record([x.tag for x in item], [_value(x) for x in item]))
+    return rows
+
+
+def request_report(id=REPORT_TITLES, skip=0, size=PAGE_SIZE, **args):
+    """Rows of a page of a report. args are other parameters of the report (type='anime'...)"""
+    from anime_news_network.search import get_client
+    client = get_client()
+    query_search = dict(args, id=id, nskip=skip, nlist=size)
+    return parse_report(client.request(query_search, url=client.reports_url).content)
+
+
+def iter_report_pages(id=REPORT_TITLES, size=PAGE_SIZE, **args):
+    """Yield the rows of each page of a report. Each page is requested when the previous one
+    has been consumed. The rows repeated in two pages (the titles added while paging move
+    the rest) are only in the first one.
+    """
+    seen = set()
+    skip = 0
+    while True:
+        rows = request_report(id, skip, size, **args)
+        page = [row for row in rows if row.get('id') not in seen]
+        seen.update(row.get('id') for row in page)
+        yield page
+        if len(rows) < size:
+            return
+        skip += len(rows)
+
+
+def iter_report(id=REPORT_TITLES, size=PAGE_SIZE, **args):
+    """Yield the rows of all the pages of a report"""
+    for page in iter_report_pages(id, size, **args):
+        for row in page:
+            yield row
+
+
+def _digest(row):
+    return zlib.crc32(json.dumps(row.to_json(), sort_keys=True).encode('utf-8')) & 0xffffffff
+
+
+class ReportTracker(object):
+    """Changes of the rows of a report since the last run. A digest of each row is saved in
+    the cache backend (reports/<name>.json) with save()::
+
+        tracker = ReportTracker(type='anime')
+        changes = tracker.changes()
+        search_many([row.id for row in changes.added + changes.modified], cache=False)
+        tracker.save()
+
+    By default only the first pages are read, until a page without changes: the new titles
+    (the report lists first the last added ones) and the modified rows among them. With
+    full=True the whole report is read, and the removed titles are found too.
+    """
+
+    def __init__(self, id=REPORT_TITLES, name=None, size=PAGE_SIZE, **args):
+        self.id = id
+        self.name = name or '-'.join(['report', str(id)] + ['{}-{}'.format(*x) for x in sorted(args.items())])
+        self.size = size
+        self.args = args
+        self.pending = None
+
+    @property
+    def key(self):
+        return 'reports/{}.json'.format(self.name)
+
+    def load(self):
+        """Digests of the rows of the last run: {id: digest}"""
+        data = get_cache_backend().get(self.key)
+        if data is None:
+            return {}
+        return {int(key): value for key, value in json.loads(data.decode('utf-8'))['rows'].items()}
+
+    def changes(self, full=False):
+        """Changes(added, modified, removed): rows added and modified and ids removed. The
+        first run returns all the rows read as added.
+        """
+        previous = self.load()
+        digests = {} if full else dict(previous)
+        added, modified = [], []
+        for page in iter_report_pages(self.id, self.size, **self.args):
+            changed = False
+            for row in page:
+                digest = digests[row.id] = _digest(row)
+                if row.id not in previous:
+                    added.append(row)
+                elif previous[row.id] != digest:
+                    modified.append(row)
+                else:
+                    continue
+                changed = True
+            if not changed and not full:
+                break
+        removed = sorted(set(previous) - set(digests)) if full else []
+        self.pending = digests
+        return Changes(added, modified, removed)
+
+    def save(self):
+        """Save the rows of the last changes(), after processing them"""
+        if self.pending is None:
+            return
+        data = {'id': self.id, 'args': self.args, 'rows': {str(key): value for key, value in self.pending.items()}}
+        get_cache_backend().set(self.key, json.dumps(data).encode('utf-8'))
+        self.pending = None
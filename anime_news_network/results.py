@@ -1,13 +1,14 @@
 import datetime
 import re
+import threading
+from collections import OrderedDict
 
-import dateutil
-import dateutil.parser
 import six
 from lxml import etree
 
+from anime_news_network import metrics
 from anime_news_network.cache import save_title_cache
-from anime_news_network.utils import parse_date, safe_compare
+from anime_news_network.utils import parse_date, parse_datetime, safe_compare
 
 
 def match_dict(target, match):
@@ -17,23 +18,142 @@ def match_dict(target, match):
     return True
 
 
+class ItemSchema(object):
+    """Dispatch tables of an ItemBase class (tag_classes, tag_attr_classes, classes_lists,
+    classes_attrs, attrs_content and _parse_* methods), compiled once per class.
+    """
+
+    def __init__(self, cls):
+        self.tag_classes = dict(cls.tag_classes)
+        # (tag, type): class. Sólo si todos los tag_attr_classes se distinguen por el type
+        self.tag_type_classes = {}
+        self.tag_attr_classes = None
+        for (tag, attrs), class_ in cls.tag_attr_classes:
+            if list(attrs) != ['type']:
+                self.tag_attr_classes = cls.tag_attr_classes
+                break
+            self.tag_type_classes.setdefault((tag, attrs['type']), class_)
+        self.classes_lists = dict(getattr(cls, 'classes_lists', {}))
+        self.classes_attrs = dict(getattr(cls, 'classes_attrs', {}))
+        # tag: [(name, attrs)] de attrs_content
+        self.contents = {}
+        for obj in getattr(cls, 'attrs_content', []):
+            self.contents.setdefault(obj.get('tag'), []).append((obj['name'], obj.get('attrs', {})))
+        starts_with = '_parse_'
+        self.parsers = [(name.replace(starts_with, '', 1), name) for name in dir(cls)
+                        if name.startswith(starts_with) and name != '_parse_attributes']
+
+    def item_class(self, x):
+        if self.tag_attr_classes is not None:
+            for tag_attr, class_ in self.tag_attr_classes:
+                if tag_attr[0] == x.tag and match_dict(tag_attr[1], x.attrib):
+                    return class_
+        elif self.tag_type_classes:
+            class_ = self.tag_type_classes.get((x.tag, x.get('type')))
+            if class_ is not None:
+                return class_
+        return self.tag_classes.get(x.tag)
+
+
 class ItemBase(object):
     tag_classes = {}
     tag_attr_classes = []
     name = None
 
+    @classmethod
+    def schema(cls):
+        schema = cls.__dict__.get('_schema')
+        if schema is None:
+            schema = cls._schema = ItemSchema(cls)
+        return schema
+
+    def item_class(self, x):
+        return self.schema().item_class(x)
+
     def parse_item(self, x):
-        for tag_attr, class_ in self.tag_attr_classes:
-            if tag_attr[0] == x.tag and match_dict(tag_attr[1], x.attrib):
-                return class_(x)
-        return self.tag_classes[x.tag](x) if x.tag in self.tag_classes else x
+        class_ = self.item_class(x)
+        return class_(x) if class_ else x
 
     def parse_items(self, items):
         return [self.parse_item(x) for x in items]
 
+    def drop_data(self):
+        """Release the xml elements of the object and its children. save_cache() and the
+        lazy sections are not available afterwards.
+        """
+        self.data = None
+        for value in self:
+            if isinstance(value, ItemBase):
+                value.drop_data()
+
     def __repr__(self):
         return '<{}{}>'.format(self.__class__.__name__, ' {}'.format(self.name) if self.name else '')
 
+    def __deepcopy__(self, memo):
+        return self.clone()
+
+    def clone(self):
+        """Copy of the item and its children, faster than copy.deepcopy(): the immutable
+        values (str, int, dates...) and the xml elements, which are not modified, are shared
+        with the copy.
+        """
+        return self._clone({})
+
+    def _clone(self, memo):
+        cls = self.__class__
+        is_dict = isinstance(self, dict)
+        clone = memo[id(self)] = dict.__new__(cls) if is_dict else list.__new__(cls)
+        if is_dict:
+            dict.update(clone, [(key, value if type(value) in SHARED_TYPES else _clone(value, memo))
+                                for key, value in dict.items(self)])
+        else:
+            list.extend(clone, [value if type(value) in SHARED_TYPES else _clone(value, memo)
+                                for value in list.__iter__(self)])
+        # Los atributos son casi siempre los mismos objetos que los valores, ya copiados
+        state = clone.__dict__
+        for key, value in self.__dict__.items():
+            if type(value) in SHARED_TYPES:
+                state[key] = value
+            elif key == '_lock':
+                state[key] = threading.RLock()
+            else:
+                state[key] = _clone(value, memo)
+        return clone
+
+
+# Tipos de los valores que las copias comparten con el original: inmutables y elementos xml
+SHARED_TYPES = frozenset([six.text_type, six.binary_type, str, int, float, bool, type(None),
+                          datetime.date, datetime.datetime, etree._Element] + list(six.integer_types))
+
+
+def _clone(value, memo):
+    """Copy of the Items and the lists, dicts and sets in them (see ItemBase.clone)"""
+    clone = memo.get(id(value))
+    if clone is not None:
+        return clone
+    if isinstance(value, ItemBase):
+        return value._clone(memo)
+    elif type(value) is list:
+        clone = memo[id(value)] = [x if type(x) in SHARED_TYPES else _clone(x, memo) for x in value]
+    elif type(value) in (dict, OrderedDict):
+        clone = memo[id(value)] = type(value)((key, _clone(x, memo)) for key, x in value.items())
+    elif type(value) is set:
+        clone = memo[id(value)] = set(value)
+    else:
+        return value
+    return clone
+    if isinstance(value, ItemBase):
+        return value._clone(memo)
+    elif type(value) is list:
+        clone = memo[id(value)] = [_clone(x, memo) for x in value]
+    elif type(value) in (dict, OrderedDict):
+        clone = memo[id(value)] = type(value)((key, _clone(x, memo)) for key, x in value.items())
+    elif type(value) is set:
+        clone = memo[id(value)] = set(value)
+    else:
+        return value
+    return clone
+
 
 class Item(dict, ItemBase):
     classes_lists = {}
@@ -42,28 +162,49 @@ class Item(dict, ItemBase):
     set_attributes = True
     content = None
     url_base = None
+    # Atributos creados en post_init. En modo lazy post_init se llama al acceder a ellos
+    post_init_attributes = []
+    lazy = False
 
-    def __init__(self, data):
+    def __new__(cls, data=None, lazy=None):
+        if lazy and not cls.lazy:
+            cls = cls.lazy_class()
+        return super(Item, cls).__new__(cls)
+
+    def __init__(self, data, lazy=None):
         super(Item, self).__init__()
         self.data = data
         self.set_attribute('class', self.__class__.__name__)
         if self.set_attributes:
             self._set_node_attrs()
-        self._set_classes_lists()
-        self._set_classes_attrs()
-        self._set_attrs_content()
+        if self.lazy:
+            self._set_lazy()
+        else:
+            self._set_children()
         self.set_content()
         self._set_url()
         self._parse_attributes()
-        self.post_init()
+        if not self.lazy:
+            self.post_init()
+
+    @classmethod
+    def lazy_class(cls):
+        """Subclass of cls with the same name whose sections are built on first access"""
+        lazy_class = cls.__dict__.get('_lazy_class')
+        if lazy_class is None:
+            lazy_class = cls._lazy_class = type(cls.__name__, (LazyItem, cls), {'__module__': cls.__module__})
+        return lazy_class
 
     def post_init(self):
         pass
 
+    def load(self):
+        return self
+
     def _set_url(self):
         if not self.url_base:
             return
-        self.set_attribute('url', self.url_base.format(**self.to_json()))
+        self.set_attribute('url', self.url_base.format(**dict(dict.items(self))))
 
     def _set_node_attrs(self):
         for key, value in self.data.attrib.items():
@@ -81,18 +222,43 @@ class Item(dict, ItemBase):
             self.set_attribute(self.content, self.data.text)
 
     def _parse_attributes(self):
-        starts_with = '_parse_'
-        for name in dir(self):
-            if not name.startswith(starts_with) or name == '_parse_attributes':
-                continue
-            method = getattr(self, name)
-            value = method()
+        for key, name in self.schema().parsers:
+            value = getattr(self, name)()
             if value is None:
                 continue
-            self.set_attribute(name.replace(starts_with, '', 1), value)
+            self.set_attribute(key, value)
+
+    def _set_children(self):
+        """Set the classes_lists, classes_attrs and attrs_content attributes walking the
+        children once. Only the children used by these attributes are built.
+        """
+        schema = self.schema()
+        lists, attrs, contents = OrderedDict(), OrderedDict(), {}
+        for x in self.data:
+            class_ = schema.item_class(x)
+            if class_ is not None and (class_ in schema.classes_lists or class_ in schema.classes_attrs):
+                item = class_(x)
+                if class_ in schema.classes_lists:
+                    lists.setdefault(schema.classes_lists[class_], []).append(item)
+                if class_ in schema.classes_attrs:
+                    attrs[schema.classes_attrs[class_]] = item
+            for name, match in schema.contents.get(x.tag, ()):
+                if name not in contents and match_dict(match, x.attrib):
+                    contents[name] = x
+        for attr, items in lists.items():
+            if self.has_attribute(attr):
+                self[attr].extend(items)
+            else:
+                self.set_attribute(attr, items)
+        for attr, item in attrs.items():
+            self.set_attribute(attr, item)
+        for obj in self.attrs_content:
+            element = contents.get(obj['name'])
+            if element is not None:
+                self.set_attribute(obj['name'], obj['function'](element.text) if 'function' in obj else element.text)
 
     def _set_classes_lists(self, items=None):
-        items = items or self.parse_items(self.data)
+        items = self.parse_items(self.data) if items is None else items
         for item in items:
             if item.__class__ not in self.classes_lists:
                 continue
@@ -102,15 +268,17 @@ class Item(dict, ItemBase):
             self[attr].append(item)
 
     def _set_classes_attrs(self, items=None):
-        items = items or self.parse_items(self.data)
+        items = self.parse_items(self.data) if items is None else items
         for item in items:
             if item.__class__ not in self.classes_attrs:
                 continue
             attr = self.classes_attrs[item.__class__]
             self.set_attribute(attr, item)
 
-    def _set_attrs_content(self):
+    def _set_attrs_content(self, name=None):
         for obj in self.attrs_content:
+            if name is not None and obj['name'] != name:
+                continue
             xpath = ''
             xpath = xpath + (obj['tag'] if 'tag' in obj else '')
             xpath = xpath + (''.join(["[@{}='{}']".format(key, value) for key, value in obj['attrs'].items()])
@@ -136,11 +304,135 @@ class Item(dict, ItemBase):
         dt = self.get('datetime')
         if not dt:
             return
-        return dateutil.parser.parse(dt)
+        return parse_datetime(dt)
 
     def to_json(self):
         return self
 
+    def drop_data(self):
+        self.load()
+        self.data = None
+        for value in dict.values(self):
+            for item in (value if isinstance(value, list) else [value]):
+                if isinstance(item, ItemBase):
+                    item.drop_data()
+
+
+class LazyItem(object):
+    """Mixin of the lazy version of an Item class, created with Item(data, lazy=True). The
+    sections (classes_lists, classes_attrs, attrs_content and post_init_attributes) are built
+    the first time they are accessed.
+    """
+    lazy = True
+
+    def _set_lazy(self):
+        schema = self.schema()
+        lists, attrs = OrderedDict(), OrderedDict()
+        for x in self.data:
+            class_ = schema.item_class(x)
+            if class_ in schema.classes_lists:
+                lists[schema.classes_lists[class_]] = None
+            elif class_ in schema.classes_attrs:
+                attrs[schema.classes_attrs[class_]] = None
+        # Mismo orden que _set_children
+        self._sections = list(lists) + list(attrs)
+        self._head = list(dict.keys(self))
+        self._pending = set(self._sections)
+        self._pending.update(obj['name'] for obj in self.attrs_content)
+        self._pending.update(self.post_init_attributes)
+        # Las fichas en caché se comparten entre hilos: una sección se construye una sola vez
+        # y sólo deja de estar pendiente cuando ya existe
+        self._lock = threading.RLock()
+        self._loading = set()
+
+    def _load(self, name):
+        with self._lock:
+            if name not in self._pending or name in self._loading:
+                return
+            self._loading.add(name)
+            try:
+                self._build(name)
+            finally:
+                self._loading.discard(name)
+            if name in self.post_init_attributes:
+                self._pending.difference_update(self.post_init_attributes)
+            else:
+                self._pending.discard(name)
+
+    def _build(self, name):
+        if name in self._sections:
+            schema = self.schema()
+            items = []
+            for x in self.data:
+                class_ = schema.item_class(x)
+                if name in (schema.classes_lists.get(class_), schema.classes_attrs.get(class_)):
+                    items.append(class_(x))
+            self._set_classes_lists(items)
+            self._set_classes_attrs(items)
+        elif name in self.post_init_attributes:
+            self.post_init()
+        else:
+            self._set_attrs_content(name)
+
+    def _load_key(self, key):
+        pending = self.__dict__.get('_pending')
+        if pending and key in pending:
+            self._load(key)
+
+    def load(self):
+        """Build all the pending sections"""
+        pending = self.__dict__.get('_pending')
+        if not pending:
+            return self
+        front = self._head + self._sections + [obj['name'] for obj in self.attrs_content]
+        for name in front + self.post_init_attributes:
+            self._load_key(name)
+        # Mismo orden de claves que sin modo lazy: secciones, resto de atributos y los de post_init
+        order = front + [key for key in dict.keys(self) if key not in front and key not in self.post_init_attributes]
+        order += self.post_init_attributes
+        items = [(key, dict.__getitem__(self, key)) for key in order if dict.__contains__(self, key)]
+        dict.clear(self)
+        dict.update(self, items)
+        return self
+
+    def __getattr__(self, name):
+        # Sólo se llama si el atributo no existe todavía
+        pending = self.__dict__.get('_pending')
+        if pending and name in pending:
+            self._load(name)
+            return object.__getattribute__(self, name)
+        raise AttributeError(name)
+
+    def __getitem__(self, key):
+        self._load_key(key)
+        return super(LazyItem, self).__getitem__(key)
+
+    def get(self, key, default=None):
+        self._load_key(key)
+        return super(LazyItem, self).get(key, default)
+
+    def __contains__(self, key):
+        self._load_key(key)
+        return super(LazyItem, self).__contains__(key)
+
+    def __iter__(self):
+        return super(LazyItem, self.load()).__iter__()
+
+    def __len__(self):
+        return super(LazyItem, self.load()).__len__()
+
+    def keys(self):
+        return super(LazyItem, self.load()).keys()
+
+    def values(self):
+        return super(LazyItem, self.load()).values()
+
+    def items(self):
+        return super(LazyItem, self.load()).items()
+
+    def to_json(self):
+        return self.load()
+
 
 class Title(Item):
     content = 'name'
@@ -283,7 +575,7 @@ class Manganime(Item):
     # xml element tag: class
     tag_classes = {
         'news': News, 'staff': Staff, 'episode': Episode, 'credit': Credit, 'cast': Cast, 'release': Release,
-        'ratings': Rating, 'related-prev': RelatedPrev
+        'ratings': Rating, 'related-prev': RelatedPrev, 'related-next': RelatedNext
     }
     tag_attr_classes = [
         (('info', {'type': 'Opening Theme'}), Opening),
@@ -312,6 +604,7 @@ class Manganime(Item):
         MainTitle: 'main_title', Rating: 'rating', Pictures: 'pictures', RelatedPrev: 'related_prev',
         RelatedNext: 'related_next'
     }
+    post_init_attributes = ['release_date']
 
     def _related(self, name):
         obj = self.get('related_{}'.format(name))
@@ -325,6 +618,11 @@ class Manganime(Item):
     def prev(self):
         return self._related('prev')
 
+    def franchise(self, max_depth=None, max_titles=None):
+        """Titles connected with this one by related-prev/related-next links"""
+        from anime_news_network.franchise import walk
+        return walk(self['id'], max_depth, max_titles)
+
     def post_init(self):
         if self.get('vintages') and 'release_date' in self['vintages'][0]:
             self.set_attribute('release_date', self['vintages'][0]['release_date'])
@@ -344,24 +642,52 @@ class Manga(Manganime):
 class Results(list, ItemBase):
     tag_classes = {'anime': Anime, 'manga': Manga}
 
-    def __init__(self, data):
+    def __init__(self, data, lazy=False):
         super(Results, self).__init__()
-        if isinstance(data, six.string_types):
+        self.lazy = lazy
+        start = metrics.timer() if metrics.registry.enabled else None
+        if isinstance(data, (six.string_types, six.binary_type)):
             data = etree.fromstring(data)
         if isinstance(data, list):
             self.extend(data)
+            start = None
         else:
             self.extend(self.parse_items(data))
-        for item in self:
-            if not isinstance(item, Manganime):
-                self.remove(item)
+        # Se descartan los elementos que no son fichas (por ejemplo <warning>)
+        self[:] = [item for item in self if isinstance(item, Manganime)]
+        if start is not None:
+            metrics.registry.observe('parse_seconds', metrics.timer() - start)
+            metrics.registry.increment('parsed_titles_total', len(self))
+
+    def parse_item(self, x):
+        class_ = self.item_class(x)
+        return class_(x, lazy=self.lazy) if class_ else x
 
     def to_json(self):
         return [obj.to_json() for obj in self]
 
+    def to_records(self):
+        """Compact copies of the titles (see anime_news_network.records)"""
+        from anime_news_network.records import compact
+        return compact(self)
+
     def save_cache(self):
         for item in self:
             item.save_cache()
 
     def sort_by(self, key):
         return Results(sorted([x for x in self], key=safe_compare(lambda x: x.get(key))))
+
+
+def iter_results(source, lazy=False):
+    """Parse incrementally a file-like object with an ANN response. Each title is yielded
+    as soon as its element is closed. The element is detached from the document with the
+    previous siblings, so the memory used does not grow with the size of the response.
+    """
+    for event, element in etree.iterparse(source, events=('end',), tag=tuple(Results.tag_classes)):
+        parent = element.getparent()
+        if parent is not None:
+            while element.getprevious() is not None:
+                del parent[0]
+            parent.remove(element)
+        yield Results.tag_classes[element.tag](element, lazy=lazy)
@@ -1,75 +1,282 @@
-from threading import Event
+from collections import OrderedDict
 
-import requests
-import time
-
-from anime_news_network.cache import load_title_cache, save_word_cache, load_word_cache
-from anime_news_network.results import Results
+from anime_news_network import memory, metrics
+from anime_news_network.cache import load_title_cache, save_word_cache, load_word_cache, touch_title_cache, \
+    save_title_validators, load_title_validators, save_title_miss, title_miss_age, word_cache_age, title_cache_age
+from anime_news_network.client import Client, URL, DELAY
+from anime_news_network.freshness import get_policy, get_refresher, FRESH, STALE, EXPIRED
+from anime_news_network.results import Results, iter_results
+from anime_news_network.singleflight import SingleFlight
 from lxml import etree
 
-THREAD_TIMEOUT = 10
-URL = 'http://cdn.animenewsnetwork.com/encyclopedia/api.xml'
-DELAY = 1
 LABELS = ['anime', 'manga', 'title']
 LABEL_IDS = 'title'
+# Máximo de ids que acepta la API en una misma petición (title=1/2/3...)
+MAX_IDS = 50
+# Construir las fichas en modo lazy (las secciones se crean al acceder a ellas)
+LAZY = False
+# Responder las búsquedas por palabras con el índice local (anime_news_network.index)
+LOCAL_INDEX = False
+# Segundos durante los que se recuerda que una búsqueda no tiene resultados (palabras sin
+# títulos e ids inexistentes). Con 0 no se recuerdan
+NEGATIVE_TTL = 24 * 60 * 60
+# Refrescar en segundo plano las entradas caducadas (stale) de la caché que se sirven (ver
+# anime_news_network.freshness). Desactivado por defecto: se sirven sin refrescar hasta que
+# expiran (stale_ttl) y se vuelven a pedir al buscarlas
+BACKGROUND_REFRESH = False
 
-searchs = []
-last_search = 0
+default_client = None
+# Peticiones en curso de search(), compartidas por las llamadas concurrentes iguales. Los
+# resultados son del llamador (pueden modificarse): las que esperan reciben una copia
+flights = SingleFlight(copy=lambda results: results.clone())
 
 
 def is_id(query):
     return isinstance(query, int)
 
 
-def _search_cache(query, type):
+def _results(data):
+    return Results(data, lazy=LAZY)
+
+
+def _load_titles(ids):
+    """Return a dict id: Manganime with the titles in cache. The ids without cache are omitted.
+    Each call returns new objects, which the caller can modify.
+    """
+    items = {}
+    ann = etree.Element('ann')
+    for id in ids:
+        item = memory.manganimes.get(str(id))
+        if item is not None:
+            items[id] = item.clone()
+            continue
+        element = load_title_cache(id, ext='xml')
+        if element is not None:
+            ann.append(element)
+    results = _results(ann)
+    _remember(results)
+    items.update((item.id, item) for item in results)
+    return items
+
+
+def _is_negative(age):
+    return age is not None and age < NEGATIVE_TTL
+
+
+def _save_misses(ids, results):
+    """Save as missing the ids requested without result"""
+    found = {item.id for item in results}
+    for id in ids:
+        if id not in found:
+            save_title_miss(id)
+
+
+def _is_served(state, key, refresher=None):
+    """Whether a cache entry can be served. With BACKGROUND_REFRESH, the stale ones are
+    refreshed in background by refresher (by default, the one of the sync client).
+    """
+    if state == STALE and BACKGROUND_REFRESH:
+        (refresher or get_refresher()).add(key)
+    return state != EXPIRED
+
+
+def _title_state(item):
+    # Por la clase (Anime o Manga) y no por item.data, que no existe tras drop_data()
+    label = item.__class__.__name__.lower()
+    return get_policy(label).title_state(item, title_cache_age(item.id, ext='xml'))
+
+
+def _remember(results):
+    # La caché guarda una copia: los títulos devueltos son del llamador (pueden modificarse
+    # o llamar a drop_data())
+    for item in results:
+        memory.manganimes.set(str(item.id), item.clone())
+
+
+def _search_cache(query, type, refresher=None):
     if is_id(query):
-        results = load_title_cache(query, ext='xml')
+        ids = [query]
     else:
-        results = load_word_cache(query, type)
-    if results is None:
-        return
+        ids = load_word_cache(query, type)
+        if ids is None:
+            return
+        ids = [int(x) for x in ids.split(',') if x]
+        age = word_cache_age(query, type)
+        if not ids and not _is_negative(age):
+            return
+        if not ids and metrics.registry.enabled:
+            metrics.registry.increment('cache_hits_total', layer='negative')
+        if ids and not _is_served(get_policy(type).words_state(age), (query, type), refresher):
+            return
+    items = _load_titles(ids)
     if is_id(query):
-        results = [results]
+        if not items:
+            if not _is_negative(title_miss_age(query)):
+                return
+            if metrics.registry.enabled:
+                metrics.registry.increment('cache_hits_total', layer='negative')
+            return Results([])
+        if not _is_served(_title_state(items[query]), query, refresher):
+            return
     else:
-        results = [int(x) for x in results.split(',') if x]
-        results = [load_title_cache(result, ext='xml') for result in results]
-    ann = etree.Element('ann')
-    for result in results:
-        ann.append(result)
-    return Results(ann)
+        for item in items.values():
+            # Los títulos de una búsqueda vigente se sirven aunque no estén frescos
+            if BACKGROUND_REFRESH and _title_state(item) != FRESH:
+                (refresher or get_refresher()).add(item.id)
+    return Results([items[id] for id in ids if id in items])
+
+
+def _search_index(query, label, fallback=True):
+    from anime_news_network.index import get_title_index
+    ids = get_title_index().search(query, label)
+    if ids is None or (not ids and fallback):
+        return
+    items = _load_titles(ids)
+    return Results([items[id] for id in ids if id in items])
 
 
-def search(query, label='title'):
+def search(query, label='title', local=None, fallback=True):
+    """Search titles by id or by words. With local=True (or LOCAL_INDEX) the words searches
+    not in cache are answered with the local index of the cached titles. If there are no
+    matches in the index, the API is used only with fallback=True. The searches without
+    results are remembered NEGATIVE_TTL seconds. Concurrent calls with the same query share
+    the same request. The cached results are renewed following the freshness policies.
+    """
     if is_id(query):
         label = LABEL_IDS
+    start = metrics.timer() if metrics.registry.enabled else None
+    source = 'cache'
     results = _search_cache(query, label)
+    if results is None and not is_id(query) and (LOCAL_INDEX if local is None else local):
+        source = 'index'
+        results = _search_index(query, label, fallback)
     if results is None:
+        source = 'api'
+        results = flights.do((label, query), _search_once, query, label)
+    if start is not None:
+        metrics.registry.observe('search_seconds', metrics.timer() - start, source=source)
+    return results
+
+
+def _search_once(query, label):
+    # Otro hilo pudo terminar la misma petición tras la primera consulta a la caché
+    results = _search_cache(query, label)
+    if results is None and is_id(query):
+        # Título expirado (o sin caché): petición condicional si se guardaron sus validadores
+        results = refresh(query)
+    elif results is None:
         results = _search_request(query, label)
     return results
 
 
-def _search_request(query, label):
-    from anime_news_network.results import Results
-    # Última petición en espera
-    wait_to = searchs[-1] if searchs else None
-    my_event = Event()
-    # Pongo el Event (semáforo) a la lista para que las siguientes sepan que existe
-    searchs.append(my_event)
-    if wait_to:
-        # Si hay una petición ya en curso, espero a que termine
-        wait_to[-1].wait(THREAD_TIMEOUT)
-    # Tengo que espera DELAY entre búsqueda y búsqueda
-    if last_search and time.time() - last_search < DELAY:
-        time.sleep(max(DELAY - time.time() - last_search, 0))
-    query_search = {label: str(query) if is_id(query) else '~{}'.format(query)}
-    data = requests.get(URL, query_search)
-    # Libero para que otros puedan hacen consultas
-    my_event.set()
-    searchs.remove(my_event)
-    results = Results(data.text)
+def get_client():
+    global default_client
+    if default_client is None:
+        default_client = Client()
+    return default_client
+
+
+def set_client(client):
+    global default_client
+    default_client = client
+
+
+def _request(query_search):
+    return get_client().request(query_search).content
+
+
+def iter_search(query, label='title'):
+    """Like search(), but the titles are yielded while the response is downloaded and
+    parsed. Each title is saved in the cache as soon as it is received.
+    """
+    if is_id(query):
+        label = LABEL_IDS
+    results = _search_cache(query, label)
+    if results is not None:
+        for item in results:
+            yield item
+        return
+    response = get_client().request(_query_search(query, label), stream=True)
+    response.raw.decode_content = True
+    ids = []
+    try:
+        for item in iter_results(response.raw, lazy=LAZY):
+            item.save_cache()
+            _remember([item])
+            ids.append(item.id)
+            yield item
+    finally:
+        response.close()
+    if not is_id(query):
+        save_word_cache(query, label, ids)
+    elif not ids:
+        save_title_miss(query)
+
+
+def _query_search(query, label):
+    return {label: str(query) if is_id(query) else '~{}'.format(query)}
+
+
+def _save_results(results, query=None, label=None):
     # Guardo los titles (es decir, las fichas)
     results.save_cache()
-    if not is_id(query):
+    _remember(results)
+    if query is not None and not is_id(query):
         # Si es una búsqueda por palabras,
         save_word_cache(query, label, [result.id for result in results])
     return results
+
+
+def _search_request(query, label):
+    response = get_client().request(_query_search(query, label))
+    results = _save_results(_results(response.content), query, label)
+    if is_id(query):
+        save_title_validators(query, response.headers)
+        _save_misses([query], results)
+    return results
+
+
+def refresh(id):
+    """Request again a title. If the API supports conditional requests and the title has
+    not been modified, the cached title is returned.
+    """
+    if load_title_cache(id, ext='xml') is None:
+        return _search_request(id, LABEL_IDS)
+    validators = load_title_validators(id)
+    response = get_client().revalidate(_query_search(id, LABEL_IDS), **validators)
+    if response is None:
+        touch_title_cache(id, ext='xml')
+        # El título recién validado se devuelve sin volver a consultar su política
+        return Results(list(_load_titles([id]).values()))
+    save_title_validators(id, response.headers)
+    return _save_results(_results(response.content))
+
+
+def _unique_ids(ids):
+    return list(OrderedDict((int(x), None) for x in ids))
+
+
+def _ids_chunks(ids):
+    for i in range(0, len(ids), MAX_IDS):
+        yield {LABEL_IDS: '/'.join(map(str, ids[i:i + MAX_IDS]))}
+
+
+def search_many(ids, cache=True):
+    """Search several titles by id. Cached titles are loaded from the cache and the
+    missing ones are requested in groups of up to MAX_IDS ids per request. The ids known
+    to be missing (NEGATIVE_TTL) are not requested. With cache=False all the titles are
+    requested again.
+    """
+    ids = _unique_ids(ids)
+    items = _load_titles(ids) if cache else {}
+    if cache:
+        ids = [id for id in ids if id in items or not _is_negative(title_miss_age(id))]
+    for query_search in _ids_chunks([id for id in ids if id not in items]):
+        results = _save_results(_results(_request(query_search)))
+        _save_misses(map(int, query_search[LABEL_IDS].split('/')), results)
+        items.update((item.id, item) for item in results)
+    # Los ids sin resultado (<warning>) no se devuelven
+    return Results([items[id] for id in ids if id in items])
+
+
+fetch_titles = search_many
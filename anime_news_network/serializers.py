@@ -0,0 +1,72 @@
+import datetime
+import json
+import re
+
+import six
+
+from anime_news_network.results import ItemBase
+from anime_news_network.records import Record
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Clave 'class' (siempre la primera de cada Item) en la salida compacta de orjson. Las comillas
+# de dentro de las cadenas JSON van escapadas, así que sólo coincide con claves reales
+CLASS_KEY_RE = re.compile(br'{"class":"[^"]*",?')
+SCALARS = frozenset(six.string_types + six.integer_types + (six.text_type, float, bool, type(None)))
+
+
+def to_builtin(value, include_class=False):
+    """Convert Items, Records, Results and dates into dicts, lists and strings. The 'class'
+    keys are removed unless include_class is True.
+    """
+    cls = value.__class__
+    if cls in SCALARS:
+        return value
+    elif isinstance(value, dict) or cls is Record:
+        items = dict.items(value.load()) if isinstance(value, ItemBase) else value.items()
+        return {key: x if x.__class__ in SCALARS else to_builtin(x, include_class)
+                for key, x in items if include_class or key != 'class'}
+    elif isinstance(value, list):
+        return [x if x.__class__ in SCALARS else to_builtin(x, include_class) for x in value]
+    elif isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def _orjson_default(value):
+    if isinstance(value, Record):
+        return dict(value)
+    raise TypeError('Type not serializable')
+
+
+def _load(value):
+    # orjson lee directamente el dict, así que las secciones lazy deben estar creadas
+    for item in (value if isinstance(value, list) else [value]):
+        if isinstance(item, ItemBase) and item.lazy:
+            item.load()
+
+
+def dumps(value, indent=None, include_class=False):
+    """Serialize to JSON. Without indent, orjson is used if it is installed."""
+    if orjson is None or indent:
+        return json.dumps(to_builtin(value, include_class), indent=indent, ensure_ascii=False)
+    _load(value)
+    data = orjson.dumps(value, default=_orjson_default)
+    if not include_class:
+        data = CLASS_KEY_RE.sub(b'{', data)
+    return data.decode('utf-8')
+
+
+def dump_ndjson(titles, fp, include_class=False):
+    """Write a JSON document per line for each title of an iterable (Results, iter_search()...)
+    to a text file. Return the number of titles written.
+    """
+    count = 0
+    for title in titles:
+        fp.write(dumps(title, include_class=include_class))
+        fp.write('\n')
+        count += 1
+    return count
@@ -0,0 +1,44 @@
+import threading
+
+
+class _Call(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Run a function once for the concurrent calls with the same key. The calls made while
+    the first one is running wait for it and receive its result (or its exception). With
+    copy, each waiting call receives copy(result) instead of the object of the first one.
+    """
+
+    def __init__(self, copy=None):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.copy = copy
+
+    def do(self, key, function, *args, **kwargs):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            if self.copy is not None and call.result is not None:
+                return self.copy(call.result)
+            return call.result
+        try:
+            call.result = function(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.event.set()
+        return call.result
@@ -0,0 +1,201 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from anime_news_network.cache import TitleStore, CACHE_DIR, DirectoryTitleStore, makedirs
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PACK_FILE = os.path.join(CACHE_DIR, 'titles.pack')
+# Cabecera de cada registro: longitud del nombre, longitud de los datos, compresión y fecha
+RECORD_HEADER = struct.Struct('<HIBd')
+COMPRESSIONS = {None: 0, 'zlib': 1, 'zstd': 2}
+
+
+def compress(data, compression):
+    if compression == 'zlib':
+        return zlib.compress(data)
+    elif compression == 'zstd':
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def decompress(data, flag):
+    if flag == COMPRESSIONS['zlib']:
+        return zlib.decompress(data)
+    elif flag == COMPRESSIONS['zstd']:
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+class PackedTitleStore(TitleStore):
+    """Titles store in a single append-only file. Each record is a RECORD_HEADER, the name
+    and the (optionally compressed) data. The latest record of a name is the valid one.
+    The index name: (offset, length, compression, time) is kept in memory and saved in a
+    <path>.idx file with the size, inode and mtime of the file when it was saved. On open,
+    the index is used if they match; otherwise the whole file is scanned again.
+    The records are read through a memory map. Only one process should write the store.
+    """
+
+    def __init__(self, path=PACK_FILE, compression='zlib'):
+        if compression == 'zstd' and zstandard is None:
+            raise ImportError('The zstandard package is required for zstd compression')
+        self.path = path
+        self.index_path = '{}.idx'.format(path)
+        self.compression = compression
+        self.lock = threading.RLock()
+        self.index = {}
+        self._file = None
+        self._mmap = None
+        self._open()
+
+    def _open(self):
+        makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, 'ab')
+        self._mmap = None
+        position = self._load_index()
+        self._scan(position)
+
+    def _load_index(self):
+        if not os.path.lexists(self.index_path):
+            return 0
+        with open(self.index_path) as f:
+            data = json.load(f)
+        if data.get('file') != self._file_signature():
+            # El archivo ha cambiado (o se ha sustituido) desde que se guardó el índice
+            return 0
+        self.index = {name: tuple(value) for name, value in data['index'].items()}
+        return data['size']
+
+    def save_index(self):
+        with self.lock:
+            self._file.flush()
+            tmp = '{}.tmp'.format(self.index_path)
+            with open(tmp, 'w') as f:
+                json.dump({'size': os.path.getsize(self.path), 'file': self._file_signature(),
+                           'index': self.index}, f)
+            os.rename(tmp, self.index_path)
+
+    def _file_signature(self):
+        stat = os.stat(self.path)
+        return [stat.st_size, stat.st_ino, stat.st_mtime]
+
+    def _scan(self, position):
+        with open(self.path, 'rb') as f:
+            f.seek(position)
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    break
+                name_length, length, flag, mtime = RECORD_HEADER.unpack(header)
+                name = f.read(name_length)
+                offset = f.tell()
+                if len(name) < name_length or offset + length > os.fstat(f.fileno()).st_size:
+                    # Registro incompleto (por ejemplo, tras un fallo al escribir)
+                    break
+                self.index[name.decode('utf-8')] = (offset, length, flag, mtime)
+                f.seek(length, os.SEEK_CUR)
+                position = f.tell()
+        if position < os.path.getsize(self.path):
+            self._file.truncate(position)
+        # truncate no mueve la posición del archivo, y _append usa tell() como offset
+        self._file.seek(0, os.SEEK_END)
+
+    def _read(self, offset, length):
+        if self._mmap is None or offset + length > len(self._mmap):
+            self._file.flush()
+            if self._mmap is not None:
+                self._mmap.close()
+            with open(self.path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap[offset:offset + length]
+
+    def _append(self, name, data, flag, mtime):
+        encoded = name.encode('utf-8')
+        self._file.write(RECORD_HEADER.pack(len(encoded), len(data), flag, mtime))
+        self._file.write(encoded)
+        offset = self._file.tell()
+        self._file.write(data)
+        self._file.flush()
+        self.index[name] = (offset, len(data), flag, mtime)
+
+    def load(self, name):
+        with self.lock:
+            entry = self.index.get(str(name))
+            if entry is None:
+                return
+            offset, length, flag, mtime = entry
+            return decompress(self._read(offset, length), flag)
+
+    def save(self, name, data):
+        data = compress(data, self.compression)
+        flag = COMPRESSIONS[self.compression]
+        with self.lock:
+            self._append(str(name), data, flag, time.time())
+
+    def age(self, name):
+        entry = self.index.get(str(name))
+        if entry is not None:
+            return time.time() - entry[3]
+
+    def touch(self, name):
+        # Se vuelve a escribir el registro con la fecha actual
+        with self.lock:
+            entry = self.index.get(str(name))
+            if entry is not None:
+                offset, length, flag, mtime = entry
+                self._append(str(name), self._read(offset, length), flag, time.time())
+
+    def ids(self):
+        return [int(name) for name in list(self.index) if name.isdigit()]
+
+    def compact(self):
+        """Rewrite the store without the old versions of the records"""
+        with self.lock:
+            tmp = '{}.tmp'.format(self.path)
+            index = {}
+            with open(tmp, 'wb') as f:
+                for name, (offset, length, flag, mtime) in sorted(self.index.items(), key=lambda x: x[1][0]):
+                    data = self._read(offset, length)
+                    encoded = name.encode('utf-8')
+                    f.write(RECORD_HEADER.pack(len(encoded), length, flag, mtime))
+                    f.write(encoded)
+                    index[name] = (f.tell(), length, flag, mtime)
+                    f.write(data)
+            self._close_files()
+            os.rename(tmp, self.path)
+            self.index = index
+            self._file = open(self.path, 'ab')
+            self.save_index()
+
+    def migrate(self, directory_store=None):
+        """Copy the titles of a DirectoryTitleStore keeping their dates"""
+        directory_store = directory_store or DirectoryTitleStore()
+        for id in directory_store.ids():
+            data = compress(directory_store.load(id), self.compression)
+            mtime = time.time() - directory_store.age(id)
+            with self.lock:
+                self._append(str(id), data, COMPRESSIONS[self.compression], mtime)
+        self.save_index()
+
+    def close(self):
+        with self.lock:
+            if self._file is not None:
+                self.save_index()
+            self._close_files()
+
+    def _close_files(self):
+        with self.lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+import zlib
+
+from anime_news_network.cache import CACHE_DIR, title_cache_age, title_miss_age, makedirs
+from anime_news_network import search
+from anime_news_network.reports import ReportTracker
+from anime_news_network.search import search_many, MAX_IDS
+
+CHECKPOINT_FILE = os.path.join(CACHE_DIR, 'sync.json')
+# Antigüedad máxima (en segundos) de un título antes de volver a pedirlo
+MAX_AGE = 30 * 24 * 60 * 60
+
+logger = logging.getLogger('anime_news_network.sync')
+
+
+class Sync(object):
+    """Download to the title cache a list of title ids, in batches of batch_size ids per
+    request. The cached titles younger than max_age seconds are skipped (with max_age=None
+    only the missing titles are requested), and so are the ids that the API reported as
+    nonexistent less than max_age seconds ago (search.NEGATIVE_TTL with max_age=None). The
+    progress is saved in the checkpoint file after each batch, so an interrupted sync is
+    resumed from the last completed batch.
+    """
+
+    def __init__(self, ids, name='sync', max_age=MAX_AGE, checkpoint=CHECKPOINT_FILE, batch_size=MAX_IDS):
+        self.ids = list(ids)
+        self.name = name
+        self.max_age = max_age
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+
+    def load_position(self):
+        if not self.checkpoint or not os.path.lexists(self.checkpoint):
+            return 0
+        with open(self.checkpoint) as f:
+            data = json.load(f)
+        return data['position'] if data.get('name') == self.name else 0
+
+    def save_position(self, position):
+        if not self.checkpoint:
+            return
+        makedirs(os.path.dirname(self.checkpoint), exist_ok=True)
+        tmp = '{}.tmp'.format(self.checkpoint)
+        with open(tmp, 'w') as f:
+            json.dump({'name': self.name, 'position': position}, f)
+        os.rename(tmp, self.checkpoint)
+
+    def clear_position(self):
+        if self.checkpoint and os.path.lexists(self.checkpoint):
+            os.remove(self.checkpoint)
+
+    def is_fresh(self, id):
+        age = title_cache_age(id, 'xml')
+        if age is not None:
+            return self.max_age is None or age < self.max_age
+        # Ids inexistentes (el espacio de ids de ANN tiene muchos huecos)
+        age = title_miss_age(id)
+        return age is not None and age < (search.NEGATIVE_TTL if self.max_age is None else self.max_age)
+
+    def run(self):
+        """Return the number of titles received"""
+        position = self.load_position()
+        if position:
+            logger.info('Resuming %s from position %d', self.name, position)
+        received = 0
+        while position < len(self.ids):
+            batch = []
+            while position < len(self.ids) and len(batch) < self.batch_size:
+                if not self.is_fresh(self.ids[position]):
+                    batch.append(self.ids[position])
+                position += 1
+            if batch:
+                received += len(search_many(batch, cache=False))
+                logger.info('%s: %d/%d', self.name, position, len(self.ids))
+            self.save_position(position)
+        self.clear_position()
+        return received
+
+
+def sync_range(start, end, **kwargs):
+    kwargs.setdefault('name', 'range-{}-{}'.format(start, end))
+    return Sync(range(start, end + 1), **kwargs).run()
+
+
+def sync_report(full=False, type=None, **kwargs):
+    """Download the titles added or modified in the titles report (see
+    anime_news_network.reports) since the last run. The first run downloads all of them.
+    Return the number of titles received.
+    """
+    tracker = ReportTracker(**({'type': type} if type else {}))
+    changes = tracker.changes(full)
+    logger.info('%s: %d added, %d modified, %d removed', tracker.name, len(changes.added),
+                len(changes.modified), len(changes.removed))
+    ids = [row.id for row in changes.added + changes.modified]
+    # Un checkpoint sólo se reanuda con la misma lista de ids
+    kwargs.setdefault('name', '{}-{:08x}'.format(tracker.name, zlib.crc32(repr(ids).encode('utf-8')) & 0xffffffff))
+    # Los títulos modificados se piden aunque estén en caché
+    kwargs.setdefault('max_age', 0)
+    received = Sync(ids, **kwargs).run()
+    tracker.save()
+    return received
@@ -1,7 +1,25 @@
+import calendar
 import datetime
+import re
 
-import dateutil
-import dateutil.parser
+# Formatos de las fechas de ANN que no necesitan dateutil: YYYY, YYYY-MM, YYYY-MM-DD y
+# YYYY-MM-DDTHH:MM:SS[Z]
+DATE_RE = re.compile(r'^(\d{4})(?:-(\d{2})(?:-(\d{2}))?)?$')
+DATETIME_RE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(Z?)$')
+# Máximo de fechas memorizadas por tabla. Al llenarse, la tabla se vacía
+MEMO_SIZE = 65536
+
+# texto: fecha ya convertida. Sólo las fechas completas, las parciales dependen de hoy
+_dates = {}
+_datetimes = {}
+_utc = None
+
+
+def _memo(table, key, value):
+    if len(table) >= MEMO_SIZE:
+        table.clear()
+    table[key] = value
+    return value
 
 
 def json_serial(obj):
@@ -14,9 +32,48 @@ def json_serial(obj):
 
 
 def parse_date(date):
+    """Convert a text into a date. Like dateutil, the missing month and day of partial dates
+    (YYYY, YYYY-MM) are taken from today, with the day limited to the days of the month.
+    """
+    value = _dates.get(date)
+    if value is not None:
+        return value
+    match = DATE_RE.match(date)
+    if match is not None:
+        year, month, day = match.groups()
+        try:
+            if day is not None:
+                return _memo(_dates, date, datetime.date(int(year), int(month), int(day)))
+            today = datetime.date.today()
+            month = int(month) if month else today.month
+            return datetime.date(int(year), month, min(today.day, calendar.monthrange(int(year), month)[1]))
+        except ValueError:
+            pass
+    import dateutil.parser
     return datetime.date(*dateutil.parser.parse(date).timetuple()[:3])
 
 
+def parse_datetime(dt):
+    """Convert a text into a datetime. The UTC datetimes (Z) are timezone aware."""
+    global _utc
+    value = _datetimes.get(dt)
+    if value is not None:
+        return value
+    match = DATETIME_RE.match(dt)
+    if match is not None:
+        if match.group(7) and _utc is None:
+            import dateutil.tz
+            _utc = dateutil.tz.tzutc()
+        try:
+            value = datetime.datetime(*map(int, match.groups()[:6]), tzinfo=_utc if match.group(7) else None)
+        except ValueError:
+            pass
+        else:
+            return _memo(_datetimes, dt, value)
+    import dateutil.parser
+    return dateutil.parser.parse(dt)
+
+
 def safe_compare(lmb=None):
     """Convert a cmp= function into a key= function
     """
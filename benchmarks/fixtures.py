@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""ANN responses used by the benchmarks.
+
+The recorded responses are saved in benchmarks/fixtures/<name>.xml. When a fixture has
+not been recorded, a synthetic response with the same shape is generated. The report
+fixture (report.xml) is a page of the titles report (reports.xml).
+
+Usage:
+    python benchmarks/fixtures.py record NAME ID [ID...]   Save a real API response
+    python benchmarks/fixtures.py record-report [--size N]  Save a page of the titles report
+    python benchmarks/fixtures.py generate                 Save the synthetic fixtures
+"""
+import argparse
+import os
+import random
+
+from lxml import etree
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+# name: (titles, episodes, news, staff and cast of each title)
+SHAPES = {
+    'small': (1, 1, 2, 3),
+    'long_running': (1, 1000, 400, 300),
+    'search': (50, 24, 10, 20),
+}
+GENRES = ['action', 'adventure', 'comedy', 'drama', 'fantasy', 'horror', 'mystery', 'romance',
+          'science fiction', 'slice of life', 'sports', 'supernatural', 'thriller']
+THEMES = ['pirates', 'school', 'mecha', 'music', 'time travel', 'vampires', 'samurai', 'magic', 'idols']
+# Filas del informe de títulos sintético
+REPORT_SIZE = 1200
+WORDS = ['angel', 'links', 'space', 'pirates', 'sword', 'hero', 'academy', 'night', 'dragon', 'star']
+
+
+def _sub(parent, tag, text=None, **attrs):
+    # Los atributos se usan tal cual: ANN usa nb_votes, weighted_score... (y generated-on)
+    element = etree.SubElement(parent, tag, {key: str(value) for key, value in attrs.items()})
+    element.text = text
+    return element
+
+
+def make_title(id, episodes=12, news=5, staff=10, seed=None):
+    """Synthetic title element with the structure of the API responses"""
+    rnd = random.Random(id if seed is None else seed)
+    kind = rnd.choice(['anime', 'manga'])
+    name = ' '.join(rnd.choice(WORDS).capitalize() for _ in range(rnd.randint(1, 3)))
+    gids = iter(range(id * 100000, (id + 1) * 100000))
+    title = etree.Element(kind, id=str(id), gid=str(next(gids)), type='TV' if kind == 'anime' else 'manga',
+                          name=name, precision='TV', **{'generated-on': '2016-09-01T10:00:00Z'})
+    if id > 1:
+        _sub(title, 'related-prev', rel='sequel of', id=id - 1)
+    _sub(title, 'related-next', rel='prequel of', id=id + 1)
+    picture = _sub(title, 'info', gid=next(gids), type='Picture', src='http://x/{}.jpg'.format(id))
+    _sub(picture, 'img', src='http://x/{}.jpg'.format(id), width=200, height=300)
+    _sub(title, 'info', name, gid=next(gids), type='Main title', lang='EN')
+    _sub(title, 'info', name.upper(), gid=next(gids), type='Alternative title', lang='JA')
+    for genre in rnd.sample(GENRES, 3):
+        _sub(title, 'info', genre, gid=next(gids), type='Genres')
+    for theme in rnd.sample(THEMES, 2):
+        _sub(title, 'info', theme, gid=next(gids), type='Themes')
+    _sub(title, 'info', 'Plot of {}.'.format(name) * 5, gid=next(gids), type='Plot Summary')
+    _sub(title, 'info', str(episodes), gid=next(gids), type='Number of episodes')
+    year = rnd.randint(1970, 2016)
+    _sub(title, 'info', '{}-04-07 to {}-06-30'.format(year, year + episodes // 50), gid=next(gids), type='Vintage')
+    _sub(title, 'info', '{}-04-07 (Japan)'.format(year), gid=next(gids), type='Premiere date')
+    _sub(title, 'info', '"Opening" by Someone', gid=next(gids), type='Opening Theme')
+    _sub(title, 'ratings', nb_votes=rnd.randint(0, 5000), weighted_score='{:.2f}'.format(rnd.uniform(1, 10)),
+         bayesian_score='{:.2f}'.format(rnd.uniform(1, 10)))
+    for i in range(1, episodes + 1):
+        episode = _sub(title, 'episode', num=i)
+        _sub(episode, 'title', 'Episode {}'.format(i), gid=next(gids), lang='EN')
+    for i in range(news):
+        _sub(title, 'news', 'News {} of {}'.format(i, name), datetime='2003-03-17T22:32:00Z', href='http://x')
+    for i in range(staff):
+        element = _sub(title, 'staff', gid=next(gids))
+        _sub(element, 'task', 'Director')
+        _sub(element, 'person', 'Person {}'.format(i), id=i)
+        element = _sub(title, 'cast', gid=next(gids), lang='JA')
+        _sub(element, 'role', 'Role {}'.format(i))
+        _sub(element, 'person', 'Actor {}'.format(i), id=i + 10000)
+    element = _sub(title, 'credit', gid=next(gids))
+    _sub(element, 'task', 'Animation Production')
+    _sub(element, 'company', 'Studio', id=13)
+    return title
+
+
+def make_response(titles=1, episodes=12, news=5, staff=10, first_id=1):
+    ann = etree.Element('ann')
+    for id in range(first_id, first_id + titles):
+        ann.append(make_title(id, episodes, news, staff))
+    return etree.tostring(ann)
+
+
+def make_report(ids):
+    """Synthetic page of the titles report with a row per id"""
+    report = etree.Element('report', skipped='0', listed=str(len(ids)))
+    args = _sub(report, 'args')
+    for tag in ('type', 'name', 'search'):
+        _sub(args, tag)
+    for id in ids:
+        title = make_title(id, episodes=0, news=0, staff=0)
+        item = _sub(report, 'item')
+        _sub(item, 'id', str(id))
+        _sub(item, 'gid', title.get('gid'))
+        _sub(item, 'type', title.get('type'))
+        _sub(item, 'name', title.get('name'))
+        _sub(item, 'precision', title.get('precision'))
+        _sub(item, 'vintage', title.find("info[@type='Vintage']").text.split(' ')[0])
+    return etree.tostring(report)
+
+
+def load_report_fixture():
+    """Recorded report page or, if there is not one, a synthetic one of REPORT_SIZE titles"""
+    path = os.path.join(FIXTURES_DIR, 'report.xml')
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+    return make_report(range(REPORT_SIZE, 0, -1))
+
+
+def load_fixture(name):
+    """Recorded response of a fixture or, if there is not one, the synthetic one"""
+    path = os.path.join(FIXTURES_DIR, '{}.xml'.format(name))
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+    return make_response(*SHAPES[name])
+
+
+def load_fixtures():
+    """The fixtures of SHAPES and the other recorded ones (except the report)"""
+    names = set(SHAPES)
+    if os.path.isdir(FIXTURES_DIR):
+        names.update(file[:-len('.xml')] for file in os.listdir(FIXTURES_DIR)
+                     if file.endswith('.xml') and file != 'report.xml')
+    return {name: load_fixture(name) for name in sorted(names)}
+
+
+def save_fixture(name, data):
+    if not os.path.isdir(FIXTURES_DIR):
+        os.makedirs(FIXTURES_DIR)
+    with open(os.path.join(FIXTURES_DIR, '{}.xml'.format(name)), 'wb') as f:
+        f.write(data)
+
+
+def record(name, ids):
+    from anime_news_network.client import Client
+    client = Client()
+    try:
+        save_fixture(name, client.request({'title': '/'.join(map(str, ids))}).content)
+    finally:
+        client.close()
+
+
+def record_report(size):
+    from anime_news_network.client import Client
+    from anime_news_network.reports import REPORT_TITLES
+    client = Client()
+    try:
+        query_search = {'id': REPORT_TITLES, 'nskip': 0, 'nlist': size}
+        save_fixture('report', client.request(query_search, url=client.reports_url).content)
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command')
+    record_parser = subparsers.add_parser('record')
+    record_parser.add_argument('name')
+    record_parser.add_argument('ids', nargs='+', type=int)
+    record_report_parser = subparsers.add_parser('record-report')
+    record_report_parser.add_argument('--size', type=int, default=REPORT_SIZE)
+    subparsers.add_parser('generate')
+    args = parser.parse_args()
+    if args.command == 'record':
+        record(args.name, args.ids)
+    elif args.command == 'record-report':
+        record_report(args.size)
+    elif args.command == 'generate':
+        for name, shape in SHAPES.items():
+            save_fixture(name, make_response(*shape))
+    else:
+        parser.print_help()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""Parse throughput of saved ANN responses (titles/sec).
+
+Usage: python benchmarks/parse.py response.xml [response2.xml...] [--repeat N] [--lazy]
+"""
+import argparse
+import time
+
+from lxml import etree
+
+from anime_news_network.results import Results
+
+
+def bench_parse(data, repeat=5, lazy=False):
+    """Best titles/sec of repeat parses of the response data"""
+    element = etree.fromstring(data)
+    best = 0
+    for i in range(repeat):
+        start = time.time()
+        # Sin argumento lazy para poder comparar con versiones anteriores
+        results = Results(element, lazy=True) if lazy else Results(element)
+        elapsed = time.time() - start
+        best = max(best, len(results) / elapsed if elapsed else 0)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--lazy', action='store_true')
+    args = parser.parse_args()
+    for file in args.files:
+        with open(file, 'rb') as f:
+            data = f.read()
+        print('{}: {:.1f} titles/sec'.format(file, bench_parse(data, args.repeat, args.lazy)))
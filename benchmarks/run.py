@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+"""Benchmark suite of the parse, cache and search paths.
+
+Measures the titles/sec of the parse of each fixture, the memory per title, the latency
+percentiles of the cache hits, the time of search() against a local stub server and the
+time of reading the titles report (full and incremental) from the stub. The
+results are printed and, with --output, saved as json to compare them with a later run
+(--compare).
+
+Usage: python benchmarks/run.py [--output results.json] [--compare previous.json]
+                                [--repeat N] [--only parse,memory,cache,search,reports]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+# La caché de los benchmarks está en un directorio temporal. Debe definirse antes de
+# importar anime_news_network
+CACHE_DIR = tempfile.mkdtemp(prefix='ann-benchmarks-')
+os.environ['ANN_CACHE_DIR'] = CACHE_DIR
+
+from anime_news_network import memory
+from anime_news_network.cache import load_title_cache, load_word_cache, save_word_cache
+from anime_news_network.client import Client
+from anime_news_network.results import Results
+from anime_news_network import search as search_module
+from anime_news_network import reports
+
+from fixtures import load_fixtures
+from parse import bench_parse
+from stub import StubServer
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+timer = getattr(time, 'perf_counter', time.time)
+BENCHMARKS = ['parse', 'memory', 'cache', 'search', 'reports']
+
+
+def percentiles(samples, scale=1e6):
+    """p50, p90 and p99 of the samples (seconds), by default in microseconds"""
+    samples = sorted(samples)
+    return {'p{}'.format(p): samples[int(round(p / 100.0 * (len(samples) - 1)))] * scale for p in (50, 90, 99)}
+
+
+def measure(function, repeat):
+    samples = []
+    for i in range(repeat):
+        start = timer()
+        function(i)
+        samples.append(timer() - start)
+    return samples
+
+
+def bench_parse_fixtures(fixtures, repeat):
+    results = {}
+    for name, data in fixtures.items():
+        results['parse.{}.titles_per_sec'.format(name)] = bench_parse(data, repeat)
+        results['parse.{}.lazy.titles_per_sec'.format(name)] = bench_parse(data, repeat, lazy=True)
+    return results
+
+
+def bench_memory(fixtures, repeat):
+    """Python memory (tracemalloc) of the Results per title. The memory of the lxml
+    elements is not included.
+    """
+    if tracemalloc is None:
+        return {}
+    results = {}
+    for name, data in fixtures.items():
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        parsed = Results(data)
+        size = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        results['memory.{}.bytes_per_title'.format(name)] = size / float(len(parsed))
+    return results
+
+
+def _fill_cache(data):
+    results = Results(data)
+    results.save_cache()
+    ids = [item.id for item in results]
+    save_word_cache('benchmark', 'title', ids)
+    return ids
+
+
+def bench_cache(fixtures, repeat):
+    ids = _fill_cache(fixtures['search'])
+    repeat = repeat * 100
+    cases = {
+        'load_title_cache.memory': lambda i: load_title_cache(ids[i % len(ids)], 'xml'),
+        'load_title_cache.store': lambda i: (memory.titles.clear(), load_title_cache(ids[i % len(ids)], 'xml')),
+        'load_word_cache': lambda i: load_word_cache('benchmark', 'title'),
+        '_search_cache.id': lambda i: search_module._search_cache(ids[i % len(ids)], 'title'),
+        '_search_cache.words': lambda i: search_module._search_cache('benchmark', 'title'),
+    }
+    results = {}
+    for name, function in cases.items():
+        # Sólo se miden los aciertos: los títulos ya construidos en la primera pasada
+        for i in range(len(ids)):
+            function(i)
+        for key, value in percentiles(measure(function, repeat)).items():
+            results['cache.{}.{}_us'.format(name, key)] = value
+    return results
+
+
+def bench_search(fixtures, repeat):
+    server = StubServer(fixtures).start()
+    client = Client(url=server.url, delay=0.001)
+    search_module.set_client(client)
+    try:
+        # Las búsquedas cached repiten la primera de las uncached
+        cases = [
+            # Palabras distintas en cada búsqueda: petición, parse y guardado de 50 títulos
+            ('words.uncached', lambda i: search_module.search('uncached{}'.format(i))),
+            ('words.cached', lambda i: search_module.search('uncached0')),
+            ('id.uncached', lambda i: search_module.search(1000000 + i)),
+            ('id.cached', lambda i: search_module.search(1000000)),
+        ]
+        results = {}
+        for name, function in cases:
+            for key, value in percentiles(measure(function, repeat), 1e3).items():
+                results['search.{}.{}_ms'.format(name, key)] = value
+        results['search.requests'] = server.requests
+        return results
+    finally:
+        search_module.set_client(None)
+        client.close()
+        server.stop()
+
+
+def bench_reports(fixtures, repeat):
+    server = StubServer(fixtures).start()
+    client = Client(url=server.url, reports_url=server.reports_url, delay=0.001)
+    search_module.set_client(client)
+    try:
+        tracker = reports.ReportTracker(name='benchmark', size=100)
+        cases = [
+            ('parse', lambda i: reports.parse_report(server.report_response('nskip=0&nlist=1000'))),
+            ('iter_report', lambda i: sum(1 for _ in reports.iter_report(size=100))),
+            ('changes.full', lambda i: (tracker.changes(full=True), tracker.save())),
+            # Sin cambios desde la ejecución anterior: sólo se lee la primera página
+            ('changes.incremental', lambda i: tracker.changes()),
+        ]
+        results = {}
+        for name, function in cases:
+            for key, value in percentiles(measure(function, repeat), 1e3).items():
+                results['reports.{}.{}_ms'.format(name, key)] = value
+        results['reports.rows'] = len(server.report)
+        return results
+    finally:
+        search_module.set_client(None)
+        client.close()
+        server.stop()
+
+
+def compare(results, previous):
+    print('{:<55} {:>12} {:>12} {:>8}'.format('benchmark', 'previous', 'current', 'ratio'))
+    for name in sorted(results):
+        if name in previous and previous[name]:
+            print('{:<55} {:>12.2f} {:>12.2f} {:>8.2f}'.format(name, previous[name], results[name],
+                                                                 results[name] / float(previous[name])))
+
+
+def run(benchmarks=BENCHMARKS, repeat=5):
+    fixtures = load_fixtures()
+    functions = {'parse': bench_parse_fixtures, 'memory': bench_memory, 'cache': bench_cache,
+                 'search': bench_search, 'reports': bench_reports}
+    results = {}
+    for name in benchmarks:
+        results.update(functions[name](fixtures, repeat))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='Save the results in a json file')
+    parser.add_argument('--compare', help='json file of a previous run')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', default=','.join(BENCHMARKS))
+    args = parser.parse_args()
+    try:
+        results = run(args.only.split(','), args.repeat)
+    finally:
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    for name in sorted(results):
+        print('{:<55} {:>12.2f}'.format(name, results[name]))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'platform': platform.platform(), 'time': time.time(),
+                       'results': results}, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)['results'])
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""Import time of anime_news_network.search (python -X importtime).
+
+Each import is run in a new interpreter; the best of --repeat runs is compared with the
+budget. Exits with status 1 if the budget is exceeded or if one of the lazy imports
+(requests, dateutil, redis...) is imported at startup.
+
+Usage: python benchmarks/startup.py [--module M] [--budget MS] [--repeat N] [--output results.json]
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+MODULE = 'anime_news_network.search'
+# Milisegundos
+BUDGET = 150
+# Módulos que sólo deben importarse al usarse
+LAZY_MODULES = ['requests', 'urllib3', 'dateutil', 'redis', 'numpy', 'aiohttp', 'orjson', 'zstandard']
+
+
+def import_times(module):
+    """Return the cumulative import time (microseconds) of module and of each module first
+    imported by it, and the lazy modules that were imported.
+    """
+    code = 'import sys, {0}; print(",".join(m for m in {1!r} if m in sys.modules))'.format(module, LAZY_MODULES)
+    process = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', code],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    stdout, stderr = process.communicate()
+    if process.returncode:
+        raise RuntimeError(stderr)
+    lines = []
+    for line in stderr.splitlines():
+        parts = line[len('import time:'):].split('|')
+        if line.startswith('import time:') and len(parts) == 3 and parts[1].strip().isdigit():
+            name = parts[2].rstrip()
+            # El nivel de anidamiento es la sangría del nombre
+            lines.append((len(name) - len(name.lstrip()), name.strip(), int(parts[1])))
+    # Las importaciones hechas por module se imprimen justo antes que él, con más sangría
+    index = max(i for i, line in enumerate(lines) if line[1] == module)
+    times = {module: lines[index][2]}
+    for level, name, value in reversed(lines[:index]):
+        if level <= lines[index][0]:
+            break
+        times[name] = value
+    return times, [x for x in stdout.strip().split(',') if x]
+
+
+def bench_startup(module=MODULE, repeat=5):
+    best, slowest, lazy = None, [], []
+    for i in range(repeat):
+        times, lazy = import_times(module)
+        if best is None or times[module] < best:
+            best = times[module]
+            slowest = sorted(((value, name) for name, value in times.items() if name != module), reverse=True)[:10]
+    return {'import_ms': best / 1000.0, 'slowest': [[name, value / 1000.0] for value, name in slowest],
+            'lazy_imported': lazy}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default=MODULE)
+    parser.add_argument('--budget', type=float, default=BUDGET, help='Milliseconds')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='Save the results in a json file')
+    args = parser.parse_args()
+    results = bench_startup(args.module, args.repeat)
+    print('{}: {:.1f} ms (budget {:.0f} ms)'.format(args.module, results['import_ms'], args.budget))
+    for name, value in results['slowest']:
+        print('    {:<50} {:>8.1f} ms'.format(name, value))
+    if results['lazy_imported']:
+        print('Imported at startup: {}'.format(', '.join(results['lazy_imported'])))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(dict(results, module=args.module, budget_ms=args.budget), f, indent=2)
+    sys.exit(1 if results['import_ms'] > args.budget or results['lazy_imported'] else 0)
@@ -0,0 +1,123 @@
+"""Local server with the API of ANN (api.xml) for the end-to-end benchmarks. The titles are
+taken from the fixtures, and the ids not found in them are generated. The words searches
+(~words) return the 'search' fixture. The pages of the titles report (reports.xml) are taken
+from the report fixture; the rows can be edited in server.report to simulate changes.
+
+The responses have an ETag, and the requests with a matching If-None-Match get a 304. The
+time and path of each request are kept in server.log, and the (status, headers) queued in
+server.errors are answered, in order, before serving the next requests normally.
+"""
+import copy
+import hashlib
+import threading
+import time
+
+from lxml import etree
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler
+from six.moves.socketserver import ThreadingMixIn
+from six.moves.BaseHTTPServer import HTTPServer
+from six.moves.urllib.parse import urlparse, parse_qs
+
+from fixtures import load_fixtures, load_report_fixture, make_title
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fixtures=None, latency=0.0):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), StubHandler)
+        self.fixtures = fixtures or load_fixtures()
+        self.latency = latency
+        self.titles = {}
+        for data in self.fixtures.values():
+            for title in etree.fromstring(data).iterchildren('anime', 'manga'):
+                self.titles[int(title.get('id'))] = etree.tostring(title)
+        # Elementos <item> del informe de títulos
+        self.report = list(etree.fromstring(load_report_fixture()).iterfind('item'))
+        self.requests = 0
+        # (time.monotonic(), path) de cada petición
+        self.log = []
+        # (status, headers) de las próximas respuestas
+        self.errors = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/api.xml'.format(self.server_port)
+
+    @property
+    def reports_url(self):
+        return 'http://127.0.0.1:{}/reports.xml'.format(self.server_port)
+
+    def get_title(self, id):
+        if id not in self.titles:
+            self.titles[id] = etree.tostring(make_title(id))
+        return self.titles[id]
+
+    def report_response(self, query):
+        query = parse_qs(query)
+        skip = int(query.get('nskip', ['0'])[0])
+        size = int(query.get('nlist', ['50'])[0])
+        rows = self.report[skip:skip + size]
+        report = etree.Element('report', skipped=str(skip), listed=str(len(rows)))
+        report.extend(copy.deepcopy(row) for row in rows)
+        return etree.tostring(report)
+
+    def response(self, query):
+        value = parse_qs(query).get('title', [''])[0]
+        if value.startswith('~'):
+            return self.fixtures['search']
+        ids = [int(x) for x in value.split('/') if x.isdigit()]
+        return b''.join([b'<ann>'] + [self.get_title(id) for id in ids] + [b'</ann>'])
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.log.append((time.monotonic(), self.path))
+            error = server.errors.pop(0) if server.errors else None
+        if server.latency:
+            threading.Event().wait(server.latency)
+        if error is not None:
+            status, headers = error
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        url = urlparse(self.path)
+        if url.path.endswith('/reports.xml'):
+            body = server.report_response(url.query)
+        else:
+            body = server.response(url.query)
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
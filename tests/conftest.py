@@ -0,0 +1,48 @@
+import os
+import sys
+import tempfile
+
+# La caché de los tests está en un directorio temporal. Debe definirse antes de importar
+# anime_news_network
+os.environ['ANN_CACHE_DIR'] = tempfile.mkdtemp(prefix='ann-tests-')
+# Servidor local y fixtures de los benchmarks
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import pytest
+
+from anime_news_network import search
+from anime_news_network.backends import FileBackend
+from anime_news_network.cache import CACHE_DIR, set_cache_backend, set_title_store, set_word_cache
+from anime_news_network.client import Client
+
+from stub import StubServer
+
+# Segundos entre peticiones de los clientes de los tests
+DELAY = 0.05
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Empty cache (titles, words searches and json files) in a temporary directory"""
+    set_cache_backend(FileBackend(str(tmp_path)))
+    yield str(tmp_path)
+    set_cache_backend(FileBackend(CACHE_DIR))
+    set_title_store(None)
+    set_word_cache(None)
+
+
+@pytest.fixture
+def server():
+    server = StubServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def client(server):
+    """Client of the stub server, used by anime_news_network.search"""
+    client = Client(url=server.url, reports_url=server.reports_url, delay=DELAY, backoff_factor=0.01)
+    search.set_client(client)
+    yield client
+    search.set_client(None)
+    client.close()
@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+
+from anime_news_network import aio
+from anime_news_network.aio import AsyncRateLimiter, AsyncSearch
+
+from conftest import DELAY
+
+
+@pytest.fixture
+def default_search(server):
+    """AsyncSearch of the stub server, used by aio.search() and aio.search_many()"""
+    search = AsyncSearch(url=server.url, rate_limiter=AsyncRateLimiter(rate=1 / DELAY))
+    aio.set_default_search(search)
+    yield search
+    aio.set_default_search(None)
+    asyncio.run(search.close())
+
+
+def test_successive_event_loops(server, cache, default_search):
+    # Cada asyncio.run() crea y cierra su bucle: la sesión y el lock del primero no sirven
+    assert [item.id for item in asyncio.run(aio.search(1))] == [1]
+    assert [item.id for item in asyncio.run(aio.search(2))] == [2]
+    assert [item.id for item in asyncio.run(aio.search_many([3, 4]))] == [3, 4]
+    assert server.requests == 3
+
+
+def test_concurrent_searches_share_the_request(server, cache, default_search):
+    async def main():
+        return await asyncio.gather(*[aio.search(5) for _ in range(5)])
+
+    assert all([item.id for item in results] == [5] for results in asyncio.run(main()))
+    assert server.requests == 1
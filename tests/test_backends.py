@@ -0,0 +1,66 @@
+import os
+import stat
+import time
+
+import pytest
+
+from anime_news_network.backends import FileBackend, SqliteBackend, RedisBackend, atomic_write
+
+
+@pytest.fixture(params=['file', 'sqlite', 'redis'])
+def backend(request, tmp_path):
+    if request.param == 'file':
+        yield FileBackend(str(tmp_path))
+    elif request.param == 'sqlite':
+        backend = SqliteBackend(str(tmp_path / 'cache.db'))
+        yield backend
+        backend.close()
+    else:
+        fakeredis = pytest.importorskip('fakeredis')
+        yield RedisBackend(fakeredis.FakeStrictRedis())
+
+
+def test_get_set_delete(backend):
+    assert backend.get('titles/1.xml') is None
+    backend.set('titles/1.xml', b'<anime id="1"/>')
+    assert backend.get('titles/1.xml') == b'<anime id="1"/>'
+    backend.set('titles/1.xml', b'<anime id="1" name="A"/>')
+    assert backend.get('titles/1.xml') == b'<anime id="1" name="A"/>'
+    backend.delete('titles/1.xml')
+    assert backend.get('titles/1.xml') is None
+    # Borrar una clave que no existe no falla
+    backend.delete('titles/1.xml')
+
+
+def test_keys(backend):
+    for key in ['titles/1.xml', 'titles/12.xml', 'titles/2.json', 'words/anime.csv']:
+        backend.set(key, b'')
+    assert sorted(backend.keys('titles/')) == ['titles/1.xml', 'titles/12.xml', 'titles/2.json']
+    assert sorted(backend.keys('titles/1')) == ['titles/1.xml', 'titles/12.xml']
+    assert list(backend.keys('other/')) == []
+
+
+def test_age_and_touch(backend):
+    assert backend.age('titles/1.xml') is None
+    backend.set('titles/1.xml', b'')
+    time.sleep(0.1)
+    age = backend.age('titles/1.xml')
+    assert 0.1 <= age < 1
+    backend.touch('titles/1.xml')
+    assert backend.age('titles/1.xml') < age
+    # Tocar una clave que no existe no la crea
+    backend.touch('titles/2.xml')
+    assert backend.age('titles/2.xml') is None
+    assert backend.get('titles/2.xml') is None
+
+
+def test_atomic_write_permissions(tmp_path):
+    path = str(tmp_path / '1.xml')
+    atomic_write(path, b'data')
+    with open(path, 'rb') as f:
+        assert f.read() == b'data'
+    # Los permisos de open() y no los 0600 del archivo temporal
+    umask = os.umask(0)
+    os.umask(umask)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~umask
+    assert os.listdir(str(tmp_path)) == ['1.xml']
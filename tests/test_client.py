@@ -0,0 +1,78 @@
+import time
+
+import pytest
+import requests
+
+from anime_news_network import client as client_module, search
+from anime_news_network.cache import load_title_validators, title_cache_age
+from anime_news_network.client import Client, get_retry_after
+
+
+def test_retry_after(server, client, monkeypatch):
+    server.errors.append((503, {'Retry-After': '1'}))
+    start = time.monotonic()
+    response = client.request({'title': '1'})
+    assert response.status_code == 200
+    assert server.requests == 2
+    assert time.monotonic() - start >= 1
+    # La espera se limita a MAX_BACKOFF
+    monkeypatch.setattr(client_module, 'MAX_BACKOFF', 0.2)
+    server.errors.append((503, {'Retry-After': '86400'}))
+    start = time.monotonic()
+    assert client.request({'title': '1'}).status_code == 200
+    assert server.requests == 4
+    assert 0.2 <= time.monotonic() - start < 1
+
+
+def test_retry_after_date():
+    class Response(object):
+        headers = {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}
+    assert get_retry_after(Response()) == 0
+    Response.headers = {'Retry-After': '120'}
+    assert get_retry_after(Response()) == 120
+
+
+def test_backoff_on_server_errors(server, client):
+    server.errors.extend([(500, {}), (429, {})])
+    assert client.request({'title': '1'}).status_code == 200
+    assert server.requests == 3
+
+
+def test_error_after_the_retries(server):
+    server.errors.extend([(503, {})] * 3)
+    client = Client(url=server.url, delay=0.01, retries=2, backoff_factor=0.01)
+    try:
+        with pytest.raises(requests.HTTPError) as error:
+            client.request({'title': '1'})
+    finally:
+        client.close()
+    assert error.value.response.status_code == 503
+    assert server.requests == 3
+
+
+def test_client_errors_are_not_retried(server, client):
+    server.errors.append((404, {}))
+    with pytest.raises(requests.HTTPError):
+        client.request({'title': '1'})
+    assert server.requests == 1
+
+
+def test_revalidation(server, client, cache):
+    results = search.search(5)
+    assert load_title_validators(5)['etag']
+    time.sleep(0.1)
+    age = title_cache_age(5, 'xml')
+    refreshed = search.refresh(5)
+    assert server.requests == 2
+    assert [item.id for item in refreshed] == [5]
+    assert refreshed[0]['name'] == results[0]['name']
+    # El 304 renueva la fecha del título en caché
+    assert title_cache_age(5, 'xml') < age
+
+
+def test_revalidation_of_a_modified_title(server, client, cache):
+    search.search(5)
+    server.titles[5] = server.titles[5].replace(b'name="', b'name="New ', 1)
+    refreshed = search.refresh(5)
+    assert refreshed[0]['name'].startswith('New ')
+    assert search.search(5)[0]['name'].startswith('New ')
@@ -0,0 +1,120 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from anime_news_network.client import Client
+from anime_news_network.ratelimit import RateLimiter
+
+from conftest import DELAY
+
+THREADS = 20
+# Margen de la separación medida en el servidor (el envío y la recepción de cada petición
+# no tardan siempre lo mismo)
+TOLERANCE = 0.01
+
+
+def run_threads(target, count=THREADS):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def spacings(times):
+    times = sorted(times)
+    return [b - a for a, b in zip(times, times[1:])]
+
+
+def test_spacing_of_concurrent_requests(server):
+    client = Client(url=server.url, delay=DELAY)
+    try:
+        run_threads(lambda i: client.request({'title': str(i + 1)}))
+    finally:
+        client.close()
+    assert server.requests == THREADS
+    assert min(spacings([t for t, _ in server.log])) >= DELAY - TOLERANCE
+
+
+def test_rate():
+    limiter = RateLimiter(rate=1 / DELAY)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    # La primera llamada no espera
+    assert time.monotonic() - start == pytest.approx(4 * DELAY, abs=TOLERANCE * 2)
+
+
+def test_fifo_order():
+    limiter = RateLimiter(rate=1 / DELAY)
+    order = []
+    threads = []
+    for i in range(10):
+        reserved = limiter.next_slot
+        thread = threading.Thread(target=lambda i=i: (limiter.acquire(), order.append(i)))
+        thread.start()
+        threads.append(thread)
+        # El siguiente hilo llega cuando éste ya ha reservado su turno
+        while limiter.next_slot == reserved:
+            time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+    assert order == list(range(10))
+
+
+def test_exception_does_not_block_the_next_callers():
+    limiter = RateLimiter(rate=1 / DELAY)
+    times = []
+
+    def call(i):
+        with limiter:
+            times.append(time.monotonic())
+            if i % 2:
+                raise ValueError(i)
+
+    def target(i):
+        try:
+            call(i)
+        except ValueError:
+            pass
+
+    start = time.monotonic()
+    run_threads(target, 10)
+    assert len(times) == 10
+    assert min(spacings(times)) >= DELAY - TOLERANCE
+    assert time.monotonic() - start < 10 * DELAY + 0.5
+
+
+def test_failed_requests_keep_the_spacing(server):
+    # La mitad de las peticiones fallan (500, sin reintentos); todas siguen separadas
+    server.errors.extend([(500, {})] * (THREADS // 2))
+    client = Client(url=server.url, delay=DELAY, retries=0)
+    failures = []
+
+    def target(i):
+        try:
+            client.request({'title': str(i + 1)})
+        except requests.HTTPError:
+            failures.append(i)
+
+    try:
+        run_threads(target)
+    finally:
+        client.close()
+    assert len(failures) == THREADS // 2
+    assert server.requests == THREADS
+    assert min(spacings([t for t, _ in server.log])) >= DELAY - TOLERANCE
+
+
+def test_clients_have_their_own_limiter(server):
+    first, second = Client(url=server.url, delay=1), Client(url=server.url, delay=1)
+    try:
+        start = time.monotonic()
+        first.request({'title': '1'})
+        second.request({'title': '2'})
+        assert time.monotonic() - start < 0.5
+    finally:
+        first.close()
+        second.close()
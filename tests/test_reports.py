@@ -0,0 +1,96 @@
+import copy
+
+from anime_news_network import reports
+from anime_news_network.cache import title_cache_ids
+from anime_news_network.reports import ReportTracker, iter_report, parse_report
+from anime_news_network.sync import sync_report
+
+from fixtures import make_report
+
+PAGE_SIZE = 100
+
+
+def add_row(server, id):
+    row = copy.deepcopy(server.report[0])
+    row.find('id').text = str(id)
+    server.report.insert(0, row)
+
+
+def find_row(server, id):
+    return next(row for row in server.report if row.find('id').text == str(id))
+
+
+def test_parse_report():
+    rows = parse_report(make_report([3, 2]))
+    assert [row.id for row in rows] == [3, 2]
+    assert isinstance(rows[0].gid, int)
+    assert set(rows[0]) == {'id', 'gid', 'type', 'name', 'precision', 'vintage'}
+
+
+def test_iter_report(server, client):
+    rows = list(iter_report(size=PAGE_SIZE))
+    assert [row.id for row in rows] == [int(row.find('id').text) for row in server.report]
+    assert server.requests == len(server.report) // PAGE_SIZE + 1
+
+
+def test_page_shift(server, client, monkeypatch):
+    # Un título añadido mientras se pagina desplaza las filas: la última de la primera página
+    # vuelve a estar en la segunda
+    request_report = reports.request_report
+
+    def request(*args, **kwargs):
+        rows = request_report(*args, **kwargs)
+        if server.requests == 1:
+            add_row(server, 5000)
+        return rows
+
+    monkeypatch.setattr(reports, 'request_report', request)
+    ids = [row.id for row in iter_report(size=PAGE_SIZE)]
+    assert len(ids) == len(set(ids)) == len(server.report) - 1
+    assert 5000 not in ids
+
+
+def test_changes(server, client, cache):
+    tracker = ReportTracker(size=PAGE_SIZE)
+    changes = tracker.changes()
+    assert len(changes.added) == len(server.report)
+    assert not changes.modified and not changes.removed
+    tracker.save()
+
+    server.log[:] = []
+    assert tracker.changes() == ([], [], [])
+    # Sin cambios sólo se lee la primera página
+    assert len(server.log) == 1
+
+    add_row(server, 5000)
+    find_row(server, 1195).find('name').text = 'Renamed'
+    removed = server.report.pop(700)
+    changes = tracker.changes()
+    assert [row.id for row in changes.added] == [5000]
+    assert [row.id for row in changes.modified] == [1195]
+    assert changes.modified[0].name == 'Renamed'
+    # Las filas quitadas sólo se ven leyendo todo el informe
+    assert changes.removed == []
+    changes = tracker.changes(full=True)
+    assert changes.removed == [int(removed.find('id').text)]
+    tracker.save()
+    assert tracker.changes(full=True) == ([], [], [])
+
+
+def test_changes_are_kept_until_saved(server, client, cache):
+    tracker = ReportTracker(size=PAGE_SIZE)
+    tracker.changes()
+    tracker.save()
+    add_row(server, 5000)
+    assert [row.id for row in tracker.changes().added] == [5000]
+    assert [row.id for row in ReportTracker(size=PAGE_SIZE).changes().added] == [5000]
+
+
+def test_sync_report(server, client, cache):
+    del server.report[50:]
+    assert sync_report(checkpoint=None) == 50
+    assert len(list(title_cache_ids('xml'))) == 50
+    find_row(server, 1190).find('name').text = 'Renamed'
+    server.log[:] = []
+    assert sync_report(checkpoint=None) == 1
+    assert [path for _, path in server.log if 'api.xml' in path] == ['/api.xml?title=1190']
@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+from anime_news_network import freshness, search
+from anime_news_network.freshness import FreshnessPolicy
+
+
+def test_concurrent_searches_share_the_request(server, client, cache):
+    # Con latencia, las demás búsquedas llegan mientras la primera espera la respuesta
+    server.latency = 0.3
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(search.search(5))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert server.requests == 1
+    assert len(results) == 5
+    # Cada llamador recibe su propia copia de los resultados
+    assert len({id(result[0]) for result in results}) == 5
+    name = results[1][0]['name']
+    results[0][0]['name'] = 'Modified'
+    del results[0][0]['episodes'][:]
+    results[0].pop()
+    assert all(result[0]['name'] == name for result in results[1:])
+    assert all(result[0]['episodes'] for result in results[1:])
+
+
+@pytest.fixture
+def revalidations(client, monkeypatch):
+    """Ids of the conditional requests made by the client"""
+    calls = []
+    revalidate = client.revalidate
+
+    def spy(query_search, **validators):
+        calls.append(int(query_search['title']))
+        return revalidate(query_search, **validators)
+
+    monkeypatch.setattr(client, 'revalidate', spy)
+    return calls
+
+
+def set_policies(monkeypatch, **kwargs):
+    policy = FreshnessPolicy(airing_ttl=0, finished_ttl=0, words_ttl=0, **kwargs)
+    monkeypatch.setattr(freshness, 'policies', {'anime': policy, 'manga': policy, 'title': policy})
+
+
+def test_expired_titles_are_revalidated(server, client, cache, revalidations, monkeypatch):
+    search.search(5)
+    set_policies(monkeypatch, stale_ttl=0)
+    assert [item.id for item in search.search(5)] == [5]
+    assert server.requests == 2
+    assert revalidations == [5]
+
+
+def test_stale_titles_are_refreshed_in_background(server, client, cache, revalidations, monkeypatch):
+    search.search(5)
+    set_policies(monkeypatch, stale_ttl=None)
+    monkeypatch.setattr(search, 'BACKGROUND_REFRESH', True)
+    assert [item.id for item in search.search(5)] == [5]
+    freshness.get_refresher().wait()
+    assert server.requests == 2
+    assert revalidations == [5]
@@ -0,0 +1,38 @@
+import os
+import shutil
+
+from anime_news_network.store import PackedTitleStore
+
+
+def test_reopen(tmp_path):
+    path = str(tmp_path / 'titles.pack')
+    store = PackedTitleStore(path)
+    store.save('1', b'<anime id="1"/>')
+    store.save('2', b'<anime id="2"/>')
+    store.close()
+    store = PackedTitleStore(path)
+    try:
+        assert sorted(store.ids()) == [1, 2]
+        assert store.load('2') == b'<anime id="2"/>'
+    finally:
+        store.close()
+
+
+def test_index_of_a_replaced_pack(tmp_path):
+    # El .idx de otro archivo (por ejemplo, tras restaurar una copia) no se usa
+    path = str(tmp_path / 'titles.pack')
+    other = str(tmp_path / 'other.pack')
+    store = PackedTitleStore(other)
+    store.save('3', b'<anime id="3"/>' * 10)
+    store.close()
+    store = PackedTitleStore(path)
+    store.save('1', b'<anime id="1"/>')
+    store.close()
+    os.remove(path)
+    shutil.move(other, path)
+    store = PackedTitleStore(path)
+    try:
+        assert list(store.ids()) == [3]
+        assert store.load('3') == b'<anime id="3"/>' * 10
+    finally:
+        store.close()
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from anime_news_network import sync
+from anime_news_network.cache import title_cache_ids
+from anime_news_network.sync import Sync, sync_range
+
+
+def requested_ids(server):
+    ids = []
+    for _, path in server.log:
+        query = path.split('title=', 1)[1]
+        ids.extend(int(x) for x in query.replace('%2F', '/').split('/'))
+    return ids
+
+
+@pytest.fixture
+def checkpoint(cache):
+    return os.path.join(cache, 'sync.json')
+
+
+def test_sync_range(server, client, checkpoint):
+    assert sync_range(1, 30, batch_size=10, checkpoint=checkpoint) == 30
+    assert sorted(title_cache_ids('xml')) == list(range(1, 31))
+    assert server.requests == 3
+    assert not os.path.exists(checkpoint)
+
+
+def test_resume_after_a_crash(server, client, checkpoint, monkeypatch):
+    search_many = sync.search_many
+    calls = []
+
+    def crash(ids, cache=True):
+        calls.append(ids)
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return search_many(ids, cache)
+
+    monkeypatch.setattr(sync, 'search_many', crash)
+    with pytest.raises(KeyboardInterrupt):
+        Sync(range(1, 51), 'test', max_age=0, checkpoint=checkpoint, batch_size=10).run()
+    assert Sync([], 'test', checkpoint=checkpoint).load_position() == 20
+    # Otra sincronización no usa el checkpoint
+    assert Sync([], 'other', checkpoint=checkpoint).load_position() == 0
+    monkeypatch.setattr(sync, 'search_many', search_many)
+    server.log[:] = []
+    # Con max_age=0 se piden de nuevo todos los títulos, pero sólo desde el checkpoint
+    assert Sync(range(1, 51), 'test', max_age=0, checkpoint=checkpoint, batch_size=10).run() == 30
+    assert requested_ids(server) == list(range(21, 51))
+    assert not os.path.exists(checkpoint)
+
+
+def test_max_age(server, client, checkpoint):
+    sync_range(1, 20, checkpoint=checkpoint)
+    server.log[:] = []
+    assert sync_range(1, 30, checkpoint=checkpoint) == 10
+    assert requested_ids(server) == list(range(21, 31))
+    server.log[:] = []
+    assert sync_range(1, 30, max_age=0, checkpoint=checkpoint) == 30
+    assert requested_ids(server) == list(range(1, 31))
+
+
+def test_missing_ids_are_not_requested_again(server, client, checkpoint):
+    get_title = server.get_title
+    server.get_title = lambda id: get_title(id) if id % 2 else b''
+    assert sync_range(1, 20, checkpoint=checkpoint) == 10
+    server.log[:] = []
+    assert sync_range(1, 20, checkpoint=checkpoint) == 0
+    assert server.requests == 1
+    assert server.log == []